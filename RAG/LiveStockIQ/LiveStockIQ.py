@@ -1,10 +1,17 @@
 import streamlit as st
-import requests
 import openai
 from dotenv import load_dotenv
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import plotly.express as px
+from downsample import downsample_frame
+from market_data import DEFAULT_BASE_URL, MarketDataClient, describe_freshness
+from ohlcv_store import OHLCVStore
+from query_router import COMPANY_ALIASES, COMPANY_TO_SYMBOL, CompanyIndex, QueryRouter, make_analysis
+from symbol_index import SymbolIndex, build_symbol_index, read_listing_csv, seed_rows
+import telemetry
 
 # Load environment variables
 load_dotenv()
@@ -13,21 +20,40 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 client = openai.OpenAI(api_key = OPENAI_API_KEY )
 
-# Define Alpha Vantage API endpoint
-BASE_URL = "https://www.alphavantage.co/query"
+# Define Alpha Vantage API endpoint; override it to point at a mirror or a local stand-in
+BASE_URL = os.getenv("ALPHA_VANTAGE_BASE_URL", DEFAULT_BASE_URL)
+# Calls per minute allowed by the Alpha Vantage plan; extra calls queue for the next token
+ALPHA_VANTAGE_REQUESTS_PER_MINUTE = int(os.getenv("ALPHA_VANTAGE_REQUESTS_PER_MINUTE", "5"))
 
-# Company-to-Symbol Mapping
-COMPANY_TO_SYMBOL = {
-    "Apple": "AAPL",
-    "Tesla": "TSLA",
-    "Google": "GOOGL",
-    "Amazon": "AMZN",
-    "Microsoft": "MSFT",
-}
+# Daily price bars are kept per symbol as Parquet; the first fetch of a symbol uses this output size
+# ("full" history needs a plan that allows it; later refreshes only fetch the latest bars).
+# With "compact", weekly and monthly charts take their older bars from the weekly/monthly series.
+OHLCV_FOLDER = "ohlcv"
+ALPHA_VANTAGE_OUTPUTSIZE = os.getenv("ALPHA_VANTAGE_OUTPUTSIZE", "compact")
 
+# Multi-company queries fetch symbols in parallel; the client's rate limiter still bounds API calls
+MAX_PARALLEL_FETCHES = int(os.getenv("MAX_PARALLEL_FETCHES", "8"))
 
-# Query Analyzer with Mapping
-def query_analyzer_with_mapping(query):
+# Charts are downsampled (LTTB) to about this many points, roughly the chart's pixel width
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1500"))
+
+# Company names and tickers are resolved through an index built from a LISTING_STATUS csv
+# (python symbol_index.py); until one exists, the index holds only COMPANY_TO_SYMBOL
+LISTING_FILE = "listing_status.csv"
+SYMBOL_INDEX_FOLDER = "symbol_index"
+
+
+# The index is memory-mapped once per process; it is built here only on first run
+@st.cache_resource
+def get_symbol_index():
+    if not SymbolIndex.exists(SYMBOL_INDEX_FOLDER):
+        rows = read_listing_csv(LISTING_FILE) if os.path.exists(LISTING_FILE) else seed_rows(COMPANY_TO_SYMBOL)
+        build_symbol_index(rows, SYMBOL_INDEX_FOLDER, COMPANY_ALIASES)
+    return SymbolIndex(SYMBOL_INDEX_FOLDER)
+
+
+# LLM Query Analyzer, used only for queries the local router cannot resolve
+def llm_query_analyzer(query):
     prompt = f"""
     Classify the following user query into one of three categories:
     1. "Stock Price" if the query is about retrieving the stock price of a company.
@@ -35,27 +61,31 @@ def query_analyzer_with_mapping(query):
     3. "General Query" if the query is a general knowledge question or unrelated to stock prices or charts.
 
     If the query is about stock prices or charts, also extract the company name and chart interval if applicable.
+    When several companies are mentioned, list them all separated by semicolons.
 
     Examples:
     1. "What is the latest stock price of Apple?" -> Category: Stock Price, Company: Apple
     2. "Provide me the daily chart of Tesla." -> Category: Stock Chart, Company: Tesla, Interval: Daily
     3. "Show me the monthly chart for Google." -> Category: Stock Chart, Company: Google, Interval: Monthly
-    4. "Tell me about the history of the stock market." -> Category: General Query
-    5. "What is the capital of France?" -> Category: General Query
+    4. "Compare Apple, Microsoft and Amazon." -> Category: Stock Price, Company: Apple; Microsoft; Amazon
+    5. "Tell me about the history of the stock market." -> Category: General Query
+    6. "What is the capital of France?" -> Category: General Query
 
     Query: "{query}"
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[
-             {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0.7
-    )
-    output = response.choices[0].message.content
-    print("LLM Response:", output)  # Debugging statement
+    with telemetry.span("livestockiq.llm_classify", model="gpt-4-turbo") as span:
+        response = client.chat.completions.create(
+            model="gpt-4-turbo",
+            messages=[
+                 {"role": "user", "content": prompt}
+            ],
+            max_tokens=150,
+            temperature=0.7
+        )
+        output = response.choices[0].message.content
+        span.set(output=output, prompt_tokens=response.usage.prompt_tokens if response.usage else None,
+                 completion_tokens=response.usage.completion_tokens if response.usage else None)
 
     category, company, interval = None, None, None
     try:
@@ -69,59 +99,81 @@ def query_analyzer_with_mapping(query):
             company = company_part.split(",")[0].strip()
             interval = output.split("Interval:")[-1].strip() if "Interval:" in output else None
 
-        # Map company name to stock symbol
-        symbol = COMPANY_TO_SYMBOL.get(company)
-        return {"category": category, "company": company, "interval": interval, "symbol": symbol}
+        # Map company names to stock symbols
+        companies = []
+        with telemetry.span("livestockiq.resolve_symbols", names=company or "") as span:
+            for name in (company or "").split(";"):
+                listing = get_symbol_index().resolve(name.strip()) if name.strip() else None
+                if listing and (name.strip(), listing.symbol) not in companies:
+                    companies.append((name.strip(), listing.symbol))
+            span.set(companies=len(companies))
+        return make_analysis(category, companies, interval)
     except Exception as e:
         print("Error parsing LLM response:", e)
-        return {"category": "General Query", "company": None, "interval": None, "symbol": None}
+        return make_analysis("General Query")
+
+
+# One router per process so its memo of past queries is shared by all sessions
+@st.cache_resource
+def get_query_router():
+    return QueryRouter(CompanyIndex(get_symbol_index()), llm_query_analyzer)
+
+
+# Query Analyzer with Mapping: local patterns and company index first, the LLM only as a fallback
+def query_analyzer_with_mapping(query):
+    return get_query_router().route(query)
+
+
+# One market-data client per process: pooled connections, TTL cache and rate limiting are shared by all sessions
+@st.cache_resource
+def get_market_data():
+    return MarketDataClient(ALPHA_VANTAGE_API_KEY, BASE_URL, requests_per_minute=ALPHA_VANTAGE_REQUESTS_PER_MINUTE)
 
 
-# Retriever for Stock Price
+# Daily bars per symbol, refreshed incrementally and shared by all sessions
+@st.cache_resource
+def get_ohlcv_store():
+    return OHLCVStore(OHLCV_FOLDER, get_market_data(), initial_outputsize=ALPHA_VANTAGE_OUTPUTSIZE)
+
+
+# Retriever for Stock Price; returns the price and how fresh it is
 def retrieve_stock_price(symbol):
-    params = {
-        "function": "GLOBAL_QUOTE",
-        "symbol": symbol,
-        "apikey": ALPHA_VANTAGE_API_KEY,
-    }
-    response = requests.get(BASE_URL, params=params)
-    data = response.json()
+    result = get_market_data().get("GLOBAL_QUOTE", symbol)
     try:
-        stock_price = data["Global Quote"]["05. price"]
-        return stock_price
+        stock_price = result.data["Global Quote"]["05. price"]
+        return stock_price, describe_freshness(result)
     except KeyError:
-        return "Could not fetch stock price. Please check the stock symbol."
+        return "Could not fetch stock price. Please check the stock symbol.", describe_freshness(result)
 
 
-# Retrieve Stock Chart
-def retrieve_stock_chart(symbol, interval):
-    function = "TIME_SERIES_DAILY" if interval.lower() == "daily" else "TIME_SERIES_WEEKLY" if interval.lower() == "weekly" else "TIME_SERIES_MONTHLY"
-    params = {
-        "function": function,
-        "symbol": symbol,
-        "apikey": ALPHA_VANTAGE_API_KEY,
+# Run fetch(symbol) for every symbol at once, so N symbols take about as long as the slowest one
+def fetch_concurrently(fetch, symbols):
+    if len(symbols) == 1:
+        return [fetch(symbols[0])]
+    with ThreadPoolExecutor(max_workers=min(len(symbols), MAX_PARALLEL_FETCHES)) as pool:
+        return list(pool.map(telemetry.wrap(fetch), symbols))
+
+
+# One comparison-table row per symbol
+def retrieve_quote_row(symbol):
+    result = get_market_data().get("GLOBAL_QUOTE", symbol)
+    quote = result.data.get("Global Quote") or {}
+    return {
+        "Symbol": symbol,
+        "Price": quote.get("05. price"),
+        "Change %": quote.get("10. change percent"),
+        "Volume": quote.get("06. volume"),
+        "Data": describe_freshness(result),
     }
-    response = requests.get(BASE_URL, params=params)
-    data = response.json()
-    try:
-        key = "Time Series (Daily)" if interval.lower() == "daily" else "Weekly Time Series" if interval.lower() == "weekly" else "Monthly Time Series"
-        time_series = data[key]
-        df = pd.DataFrame.from_dict(time_series, orient="index")
-        df = df.rename(columns={
-            "1. open": "Open",
-            "2. high": "High",
-            "3. low": "Low",
-            "4. close": "Close",
-            "5. volume": "Volume",
-        })
-        df.index = pd.to_datetime(df.index)
-        return df.sort_index()
-    except KeyError:
-        return None
 
 
-# Generator
-def generator(query, context=None):
+# Retrieve Stock Chart from the local store; weekly and monthly bars are resampled from daily ones,
+# with older bars from Alpha Vantage's weekly and monthly series when the daily history is short
+def retrieve_stock_chart(symbol, interval):
+    return get_ohlcv_store().bars(symbol, interval)
+
+
+def generator_messages(query, context=None):
     prompt = f"""
     You are an AI assistant. Below is some context:
     {context}
@@ -129,16 +181,47 @@ def generator(query, context=None):
     Answer the following query:
     {query}
     """
+    return [{"role": "user", "content": prompt}]
+
+
+# Streaming generator: yields the answer piece by piece and records time to first token,
+# tokens/s and usage in stats. Closing it early (the page was left mid-answer) closes the HTTP stream.
+def generator_stream(query, stats, context=None):
+    started, started_ns = time.perf_counter(), time.time_ns()
+    first_token_at, pieces = None, 0
+    stats["cancelled"] = True
     response = client.chat.completions.create(
         model="gpt-4-turbo",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
+        messages=generator_messages(query, context),
         max_tokens=200,
-        temperature=0.7
+        temperature=0.7,
+        stream=True,
+        stream_options={"include_usage": True},
     )
-    return response.choices[0].message.content
-
+    try:
+        for chunk in response:
+            if chunk.usage:
+                stats["prompt_tokens"] = chunk.usage.prompt_tokens
+                stats["completion_tokens"] = chunk.usage.completion_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    stats["ttft_s"] = round(first_token_at - started, 3)
+                pieces += 1
+                yield chunk.choices[0].delta.content
+        stats["cancelled"] = False
+    finally:
+        response.close()
+        finished_at = time.perf_counter()
+        stats["total_s"] = round(finished_at - started, 3)
+        tokens = stats.get("completion_tokens") or pieces
+        if first_token_at is not None and tokens > 1 and finished_at > first_token_at:
+            stats["tokens_per_s"] = round((tokens - 1) / (finished_at - first_token_at), 1)
+        telemetry.record_span(
+            "openai.chat", started_ns, model="gpt-4-turbo", stream=True, cancelled=stats["cancelled"],
+            prompt_tokens=stats.get("prompt_tokens"), completion_tokens=stats.get("completion_tokens"),
+            ttft_s=stats.get("ttft_s"), tokens_per_s=stats.get("tokens_per_s"),
+        )
 
 
 # Streamlit App
@@ -146,40 +229,83 @@ st.title("📈💰 LiveStockIQ 💹💵")
 st.write("An innovative application to retrieve real-time stock prices, stock charts, and answer general queries.")
 
 query = st.text_input("Enter your query:")
+full_resolution = st.checkbox("Full-resolution charts", value=False, help="Send every bar to the browser")
 if st.button("Submit Query"):
     if query:
-        analysis = query_analyzer_with_mapping(query)
-        print("Analysis:",analysis)
-        category = analysis.get("category")
-        print("Category", category)
-        company = analysis.get("company")
-        print("Company", company)
-        interval = analysis.get("interval")
-        print("Interval", interval)
-        symbol = analysis.get("symbol")
-        print("Symbol", symbol)
-
-        if category == "Stock Price" and symbol:
-            st.subheader("Category: Stock Price")
-            st.write(f"Fetching live stock price for {company} ({symbol})...")
-            stock_price = retrieve_stock_price(symbol)
-            st.write(f"The current stock price of {company} is: ${stock_price}")
-        elif category == "Stock Chart" and symbol and interval:
-            st.subheader(f"Category: Stock Chart ({interval.capitalize()})")
-            st.write(f"Fetching {interval.lower()} chart for {company} ({symbol})...")
-            chart_data = retrieve_stock_chart(symbol, interval)
-            if chart_data is not None:
-                fig = px.line(chart_data, x=chart_data.index, y="Close",
-                              title=f"{company} {interval.capitalize()} Stock Prices")
-                st.plotly_chart(fig)
+        with telemetry.span("livestockiq.request", query_chars=len(query)) as request_span:
+            analysis = query_analyzer_with_mapping(query)
+            category = analysis.get("category")
+            company = analysis.get("company")
+            interval = analysis.get("interval")
+            symbol = analysis.get("symbol")
+            symbols = analysis.get("symbols") or ([symbol] if symbol else [])
+            companies = analysis.get("companies") or [company]
+            request_span.set(category=category, interval=interval, symbols=symbols, route=analysis["route"])
+            st.caption(f"Routed via {analysis['route']} in {analysis['route_ms']} ms")
+
+            if category == "Stock Price" and len(symbols) > 1:
+                st.subheader("Category: Stock Price (comparison)")
+                started = time.perf_counter()
+                rows = fetch_concurrently(retrieve_quote_row, symbols)
+                for row, name in zip(rows, companies):
+                    row["Company"] = name
+                st.dataframe(pd.DataFrame(rows).set_index("Company"), use_container_width=True)
+                st.caption(f"Fetched {len(symbols)} quotes in {time.perf_counter() - started:.2f}s")
+            elif category == "Stock Price" and symbol:
+                st.subheader("Category: Stock Price")
+                st.write(f"Fetching live stock price for {company} ({symbol})...")
+                stock_price, freshness = retrieve_stock_price(symbol)
+                st.write(f"The current stock price of {company} is: ${stock_price}")
+                st.caption(f"Quote: {freshness}")
+            elif category == "Stock Chart" and symbols and interval:
+                st.subheader(f"Category: Stock Chart ({interval.capitalize()})")
+                st.write(f"Fetching {interval.lower()} chart for {', '.join(f'{c} ({s})' for c, s in zip(companies, symbols))}...")
+                started = time.perf_counter()
+                charts = fetch_concurrently(lambda s: retrieve_stock_chart(s, interval), symbols)
+                for sym, (_, freshness) in zip(symbols, charts):
+                    st.caption(f"{sym} data: {freshness}")
+                frames = {sym: chart_data for sym, (chart_data, _) in zip(symbols, charts) if chart_data is not None}
+                if len(symbols) > 1:
+                    st.caption(f"Fetched {len(symbols)} series in {time.perf_counter() - started:.2f}s")
+                if len(frames) == 1 and len(symbols) == 1:
+                    chart_data = frames[symbol]
+                    with telemetry.span("livestockiq.plot", bars=len(chart_data)) as span:
+                        plot_data = chart_data if full_resolution else downsample_frame(chart_data, "Close", CHART_MAX_POINTS)
+                        fig = px.line(plot_data, x=plot_data.index, y="Close",
+                                      title=f"{company} {interval.capitalize()} Stock Prices", render_mode="webgl")
+                        st.plotly_chart(fig)
+                        span.set(points=len(plot_data))
+                    if len(plot_data) < len(chart_data):
+                        st.caption(f"Showing {len(plot_data)} of {len(chart_data)} bars; tick Full-resolution charts for all.")
+                elif frames:
+                    # Overlay the series as % change since the first common date so different price levels compare
+                    with telemetry.span("livestockiq.plot", bars=sum(len(df) for df in frames.values())) as span:
+                        start = max(df.index[0] for df in frames.values())
+                        overlaid = []
+                        for sym, df in frames.items():
+                            df = df[df.index >= start]
+                            df = df if full_resolution else downsample_frame(df, "Close", CHART_MAX_POINTS)
+                            overlaid.append(pd.DataFrame({
+                                "Change %": (df["Close"] / df["Close"].iloc[0] - 1) * 100,
+                                "Symbol": sym,
+                            }, index=df.index))
+                        plot_data = pd.concat(overlaid)
+                        fig = px.line(plot_data, x=plot_data.index, y="Change %", color="Symbol",
+                                      title=f"{interval.capitalize()} Stock Performance (%)", render_mode="webgl")
+                        st.plotly_chart(fig)
+                        span.set(points=len(plot_data))
+                else:
+                    st.error("Could not fetch stock chart. Please try again.")
+            elif category == "General Query":
+                st.subheader("Category: General Query")
+                st.write("Fetching a response for your query...")
+                stats = {}
+                st.write_stream(generator_stream(query, stats))
+                st.caption(
+                    f"First token in {stats.get('ttft_s', '?')}s, {stats.get('tokens_per_s', '?')} tokens/s, "
+                    f"{stats.get('completion_tokens', '?')} tokens in {stats.get('total_s', '?')}s"
+                )
             else:
-                st.error("Could not fetch stock chart. Please try again.")
-        elif category == "General Query":
-            st.subheader("Category: General Query")
-            st.write("Fetching a response for your query...")
-            response = generator(query)
-            st.write(response)
-        else:
-            st.error("Could not determine the category, company, or interval. Please refine your query.")
+                st.error("Could not determine the category, company, or interval. Please refine your query.")
     else:
         st.warning("Please enter a query.")
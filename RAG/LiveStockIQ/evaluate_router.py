@@ -0,0 +1,69 @@
+"""
+Measure the local query router on a labelled corpus: how much traffic the fast path
+resolves without the LLM, how accurate those answers are, and how long routing takes.
+
+    python evaluate_router.py [query_corpus.jsonl] [symbol_index_folder | listing.csv ...]
+
+Each index is evaluated separately: a folder built by symbol_index.py, or a listing CSV
+indexed into a throwaway folder. By default the seed companies are compared with
+listing_sample.csv, an excerpt of LISTING_STATUS that keeps the tickers and names that are
+also everyday words ("ON", "OPEN", "Target"), which is what goes wrong with a full listing.
+Queries the fast path cannot resolve count as LLM fallbacks; no API calls are made.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from query_router import COMPANY_ALIASES, COMPANY_TO_SYMBOL, CompanyIndex, classify_fast, normalize_query
+from symbol_index import SymbolIndex, build_symbol_index, read_listing_csv, seed_rows
+
+SAMPLE_LISTING = "listing_sample.csv"
+
+
+def evaluate(corpus, company_index):
+    resolved, correct, mistakes, timings = 0, 0, [], []
+    for row in corpus:
+        started = time.perf_counter()
+        analysis = classify_fast(normalize_query(row["query"]), company_index)
+        timings.append(time.perf_counter() - started)
+        if analysis is None:
+            continue
+        resolved += 1
+        got = (analysis["category"], analysis["symbols"], analysis["interval"])
+        expected = (row["category"], row["symbols"], row["interval"])
+        if got == expected:
+            correct += 1
+        else:
+            mistakes.append({"query": row["query"], "expected": expected, "got": got})
+
+    timings.sort()
+    return {
+        "queries": len(corpus),
+        "fast_path_hits": resolved,
+        "fast_path_hit_rate": round(resolved / len(corpus), 3) if corpus else 0.0,
+        "fast_path_accuracy": round(correct / resolved, 3) if resolved else 0.0,
+        "p50_us": round(timings[len(timings) // 2] * 1e6, 1) if timings else 0.0,
+        "p99_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6, 1) if timings else 0.0,
+        "mistakes": mistakes,
+    }
+
+
+def load_index(source):
+    """A SymbolIndex for "seed", an index folder or a listing CSV."""
+    if os.path.isdir(source):
+        return SymbolIndex(source)
+    rows = seed_rows(COMPANY_TO_SYMBOL) if source == "seed" else read_listing_csv(source)
+    folder = tempfile.mkdtemp()
+    build_symbol_index(rows, folder, COMPANY_ALIASES)
+    return SymbolIndex(folder)
+
+
+if __name__ == "__main__":
+    corpus_path = sys.argv[1] if len(sys.argv) > 1 else "query_corpus.jsonl"
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    sources = sys.argv[2:] or ["seed", SAMPLE_LISTING]
+    report = {source: evaluate(rows, CompanyIndex(load_index(source))) for source in sources}
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from cachetools import LRUCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import telemetry
+from token_bucket import TokenBucket
+
+DEFAULT_BASE_URL = "https://www.alphavantage.co/query"
+
+# How long a response stays fresh, per Alpha Vantage function (seconds)
+DEFAULT_TTLS = {
+    "GLOBAL_QUOTE": 30,
+    "TIME_SERIES_INTRADAY": 60,
+    "TIME_SERIES_DAILY": 4 * 3600,
+    "TIME_SERIES_WEEKLY": 12 * 3600,
+    "TIME_SERIES_MONTHLY": 24 * 3600,
+}
+DEFAULT_TTL = 300
+
+# Alpha Vantage answers 200 with one of these keys when the call quota is used up
+QUOTA_KEYS = ("Note", "Information")
+
+# data is the decoded JSON ({} on failure); source is "network", "cache" or "stale"
+MarketData = namedtuple("MarketData", "data fetched_at stale source error")
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class _Flight:
+    """One in-progress request that identical concurrent requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None  # Raised in every waiter when the leader's fetch fails unexpectedly
+
+
+class MarketDataClient:
+    """
+    Alpha Vantage client shared by every session in the process:
+    - one pooled requests.Session with connect/read timeouts and retries on 5xx,
+    - a per-(function, symbol, params) TTL cache,
+    - single flight: concurrent identical requests share one API call,
+    - a token bucket that queues calls to stay inside the per-minute quota.
+    When the quota is exhausted, or a call would have to queue longer than max_queue_wait,
+    the last cached response is served with stale=True instead.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, requests_per_minute=5, ttls=None,
+                 timeout=(3.05, 20), max_queue_wait=10.0, quota_cooldown=60.0, cache_size=2048, pool_size=10):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.timeout = timeout
+        self.max_queue_wait = max_queue_wait
+        self.quota_cooldown = quota_cooldown
+        self.bucket = TokenBucket.per_minute(requests_per_minute, burst=requests_per_minute)
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._cache = LRUCache(maxsize=cache_size)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._quota_blocked_until = 0.0
+        self.stats = {"network": 0, "cache": 0, "coalesced": 0, "stale": 0, "errors": 0}
+
+    def _fresh(self, function, entry):
+        return entry is not None and time.time() - entry[1] < self.ttls.get(function, DEFAULT_TTL)
+
+    def get(self, function, symbol, **params):
+        with telemetry.span("alphavantage.get", function=function, symbol=symbol) as span:
+            result, served_by = self._get(function, symbol, params)
+            span.set(served_by=served_by, source=result.source, stale=result.stale, error=result.error)
+            return result
+
+    def _get(self, function, symbol, params):
+        """Return (result, "cache" | "coalesced" | "fetch")."""
+        key = (function, symbol, tuple(sorted(params.items())))
+        with self._lock:
+            entry = self._cache.get(key)
+            if self._fresh(function, entry):
+                self.stats["cache"] += 1
+                return MarketData(entry[0], entry[1], False, "cache", None), "cache"
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, "coalesced"
+
+        try:
+            flight.result = self._fetch(key, function, symbol, params, entry)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, "fetch"
+
+    def _fetch(self, key, function, symbol, params, entry):
+        try:
+            if time.monotonic() < self._quota_blocked_until:
+                raise QuotaExceeded("API call quota reached")
+            # Without a cached copy to fall back on, waiting for quota beats failing
+            queued_at = time.perf_counter()
+            if not self.bucket.acquire(timeout=self.max_queue_wait if entry else None):
+                raise QuotaExceeded("request queue is full")
+            with telemetry.span("alphavantage.http", function=function, symbol=symbol,
+                                queued_ms=round((time.perf_counter() - queued_at) * 1000, 1)) as span:
+                response = self.session.get(
+                    self.base_url,
+                    params=dict(params, function=function, symbol=symbol, apikey=self.api_key),
+                    timeout=self.timeout,
+                )
+                span.set(status_code=response.status_code, payload_bytes=len(response.content))
+                response.raise_for_status()
+                data = response.json()
+            if any(k in data for k in QUOTA_KEYS) and len(data) == 1:
+                self._quota_blocked_until = time.monotonic() + self.quota_cooldown
+                raise QuotaExceeded(next(iter(data.values())))
+        except (QuotaExceeded, requests.RequestException, ValueError) as e:
+            with self._lock:
+                if entry is not None:
+                    self.stats["stale"] += 1
+                    return MarketData(entry[0], entry[1], True, "stale", str(e))
+                self.stats["errors"] += 1
+            return MarketData({}, None, False, "network", str(e))
+
+        fetched_at = time.time()
+        with self._lock:
+            # Error payloads (e.g. an unknown symbol) are returned but not cached
+            if "Error Message" not in data:
+                self._cache[key] = (data, fetched_at)
+            self.stats["network"] += 1
+        return MarketData(data, fetched_at, False, "network", None)
+
+
+def describe_freshness(result):
+    """A short label for the UI: live, cached, or stale with the reason."""
+    if result.fetched_at is None:
+        return f"unavailable ({result.error})"
+    age = int(time.time() - result.fetched_at)
+    if result.stale:
+        return f"stale, fetched {age}s ago ({result.error})"
+    return "live" if result.source == "network" else f"cached {age}s ago"
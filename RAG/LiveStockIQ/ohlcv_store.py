@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+import telemetry
+
+COLUMNS = {
+    "1. open": "Open",
+    "2. high": "High",
+    "3. low": "Low",
+    "4. close": "Close",
+    "5. volume": "Volume",
+}
+# float32 holds about 7 significant digits in all, not a fixed number of decimals: Alpha Vantage's
+# 4 decimals survive only below ~$1,000 and cents below ~$131,000 (600000.1234 is stored as
+# 600000.125). The store only feeds charts, where that is invisible; quotes come from GLOBAL_QUOTE
+# as sent. In exchange it halves memory and Parquet size
+DTYPES = {"Open": "float32", "High": "float32", "Low": "float32", "Close": "float32", "Volume": "int64"}
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+# Weekly bars end on Friday and monthly bars at month end, like Alpha Vantage's own series
+RESAMPLE_RULES = {"weekly": pd.offsets.Week(weekday=4), "monthly": pd.offsets.MonthEnd()}
+AGGREGATIONS = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+# Alpha Vantage's own weekly and monthly series: full history on every plan, unlike daily bars
+LONG_SERIES = {"weekly": ("TIME_SERIES_WEEKLY", "Weekly Time Series"),
+               "monthly": ("TIME_SERIES_MONTHLY", "Monthly Time Series")}
+
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_CLOSE = (16, 30)  # Daily bars are final a little after the 16:00 close
+COMPACT_BARS = 100  # Bars returned by outputsize=compact
+
+
+def last_completed_session(now=None):
+    """Date of the latest daily bar that should exist (weekends skipped, holidays not known)."""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    day = now.date()
+    if (now.hour, now.minute) < MARKET_CLOSE:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return pd.Timestamp(day)
+
+
+def daily_frame(time_series):
+    """
+    Alpha Vantage "Time Series (Daily)" dict (or a weekly/monthly one) -> typed OHLCV frame
+    indexed by date. The string values are parsed by NumPy in one pass per column, not cell by cell.
+    """
+    with telemetry.span("ohlcv.daily_frame", bars=len(time_series)):
+        rows = np.array([[bar[key] for key in COLUMNS] for bar in time_series.values()], dtype=str).reshape(-1, len(COLUMNS))
+        df = pd.DataFrame(rows[:, :4].astype(np.float32), columns=PRICE_COLUMNS)
+        df["Volume"] = rows[:, 4].astype(np.float64).astype(np.int64)  # Volumes may be written as "1234.0"
+        df.index = pd.DatetimeIndex(np.array(list(time_series), dtype="datetime64[ns]"), name="date")
+        return df.sort_index()
+
+
+def resample(daily, interval):
+    """Daily bars -> daily, weekly or monthly bars."""
+    rule = RESAMPLE_RULES.get(interval.lower())
+    if rule is None:
+        return daily
+    return daily.resample(rule).agg(AGGREGATIONS).dropna(subset=["Close"]).astype(DTYPES)
+
+
+def splice(history, daily, interval):
+    """
+    Weekly or monthly bars: history (from Alpha Vantage's series) up to the first period the
+    daily bars may only partly cover, then bars resampled from the daily ones.
+    """
+    rule = RESAMPLE_RULES[interval.lower()]
+    recent = resample(daily, interval)
+    if history is None or history.empty:
+        return recent
+    # Alpha Vantage dates a period by its last trading day; use the resampled labels instead
+    history = history.set_axis(history.index.map(rule.rollforward).rename("date"))
+    boundary = recent.index[0]
+    return pd.concat([history[history.index <= boundary], recent[recent.index > boundary]])
+
+
+class OHLCVStore:
+    """
+    Per-symbol daily OHLCV bars kept as Parquet files. A symbol's file is only refreshed
+    when it lacks the latest completed session and was not checked within refresh_interval;
+    a refresh fetches just the recent bars (outputsize=compact) and merges them in.
+    Weekly and monthly bars are resampled locally from the daily file, so one daily fetch
+    serves every interval. Unless the daily files start from outputsize=full, they hold only
+    recent sessions, so older weekly and monthly bars come from Alpha Vantage's weekly and
+    monthly series, fetched once per symbol into SYMBOL.weekly/monthly.parquet.
+    """
+
+    def __init__(self, folder, market_data, refresh_interval=4 * 3600, initial_outputsize="compact"):
+        self.folder = folder
+        self.market_data = market_data
+        self.refresh_interval = refresh_interval
+        self.initial_outputsize = initial_outputsize
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, symbol, interval="daily"):
+        suffix = "" if interval == "daily" else f".{interval}"
+        return os.path.join(self.folder, f"{symbol.upper()}{suffix}.parquet")
+
+    def _lock(self, symbol, interval="daily"):
+        with self._locks_lock:
+            return self._locks.setdefault((symbol.upper(), interval), threading.Lock())
+
+    def _load(self, symbol, interval="daily"):
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path).astype(DTYPES)  # Files written before float32 hold float64
+
+    def _save(self, symbol, df, interval="daily"):
+        path = self._path(symbol, interval)
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, engine="pyarrow")
+        os.replace(tmp_path, path)
+
+    def _needs_refresh(self, symbol, df):
+        if df is None or df.empty:
+            return True
+        if df.index[-1] >= last_completed_session():
+            return False
+        return time.time() - os.path.getmtime(self._path(symbol)) >= self.refresh_interval
+
+    def daily(self, symbol):
+        """
+        Return (daily bars or None, status) where status says whether the bars came from
+        the local store, were refreshed, or are stale because a refresh failed.
+        """
+        with self._lock(symbol):
+            df = self._load(symbol)
+            if not self._needs_refresh(symbol, df):
+                return df, f"local store, last bar {df.index[-1].date()}"
+
+            # Compact output covers the gap unless the file is older than COMPACT_BARS sessions
+            gap = len(pd.bdate_range(df.index[-1], last_completed_session())) if df is not None and not df.empty else None
+            outputsize = "compact" if gap is not None and gap < COMPACT_BARS else self.initial_outputsize
+            result = self.market_data.get("TIME_SERIES_DAILY", symbol, outputsize=outputsize)
+            series = result.data.get("Time Series (Daily)")
+            if not series:
+                if df is None or df.empty:
+                    return None, f"unavailable ({result.error or 'no data'})"
+                os.utime(self._path(symbol))  # Do not retry before refresh_interval
+                return df, f"stale local store, last bar {df.index[-1].date()} ({result.error or 'no new data'})"
+
+            fresh = daily_frame(series)
+            if df is not None:
+                fresh = pd.concat([df[~df.index.isin(fresh.index)], fresh]).sort_index()
+            self._save(symbol, fresh)
+            return fresh, f"refreshed ({outputsize}), last bar {fresh.index[-1].date()}"
+
+    def history(self, symbol, interval, since):
+        """
+        Return (weekly or monthly bars from Alpha Vantage's own series or None, status). The
+        stored copy is reused as long as it reaches since, normally the first daily bar: from
+        there on the daily bars take over, so it rarely needs fetching again.
+        """
+        interval = interval.lower()
+        with self._lock(symbol, interval):
+            df = self._load(symbol, interval)
+            if df is not None and not df.empty and df.index[-1] >= since:
+                return df, f"{interval} history to {df.index[-1].date()}"
+            function, key = LONG_SERIES[interval]
+            result = self.market_data.get(function, symbol)
+            series = result.data.get(key)
+            if not series:
+                if df is None or df.empty:
+                    return None, f"{interval} history unavailable ({result.error or 'no data'})"
+                return df, f"{interval} history to {df.index[-1].date()}, gap to daily bars ({result.error or 'no new data'})"
+            df = daily_frame(series)
+            self._save(symbol, df, interval)
+            return df, f"{interval} history refreshed"
+
+    def bars(self, symbol, interval="daily"):
+        with telemetry.span("ohlcv.bars", symbol=symbol, interval=interval) as span:
+            daily, status = self.daily(symbol)
+            span.set(status=status)
+            if interval.lower() not in LONG_SERIES:
+                return (None if daily is None else resample(daily, interval)), status
+            if daily is not None and self.initial_outputsize == "full":
+                bars = resample(daily, interval)
+            else:
+                since = last_completed_session() if daily is None else daily.index[0]
+                history, history_status = self.history(symbol, interval, since)
+                status = f"{status}; {history_status}"
+                if daily is None:
+                    bars = history
+                else:
+                    bars = splice(history, daily, interval)
+            if bars is None:
+                return None, status
+            span.set(daily_bars=0 if daily is None else len(daily), bars=len(bars), status=status)
+            return bars, status
@@ -0,0 +1,220 @@
+import re
+import time
+
+from cachetools import LRUCache
+
+import telemetry
+
+STOCK_PRICE = "Stock Price"
+STOCK_CHART = "Stock Chart"
+GENERAL_QUERY = "General Query"
+
+# Seed listings, used to build the symbol index when no listing file has been indexed yet
+COMPANY_TO_SYMBOL = {
+    "Apple": "AAPL",
+    "Tesla": "TSLA",
+    "Google": "GOOGL",
+    "Amazon": "AMZN",
+    "Microsoft": "MSFT",
+}
+
+# Names users call companies by that are not their listed names
+COMPANY_ALIASES = {
+    "Google": "GOOGL",
+    "Alphabet": "GOOGL",
+    "Facebook": "META",
+    "Meta": "META",
+    "Tesla Motors": "TSLA",
+}
+
+# "weekly" asks for a chart on its own; "week" only sets the interval of a chart asked for otherwise
+INTERVAL_PATTERN = re.compile(r"\b(daily|weekly|monthly)\b")
+INTERVAL_NOUN_PATTERN = re.compile(r"\b(day|days|week|weeks|month|months)\b")
+INTERVALS = {"dai": "Daily", "day": "Daily", "wee": "Weekly", "mon": "Monthly"}
+CHART_PATTERN = re.compile(r"\b(chart|charts|graph|plot|candles?|candlestick)\b")
+# Words that may ask for a chart or a quote but are as common outside the market ("trend in AI",
+# "Amazon Prime cost", "Apple vs Orange"): they pick the category, never skip the LLM alone
+TREND_PATTERN = re.compile(r"\b(trend|historical|performance)\b")
+PRICE_PATTERN = re.compile(
+    r"\b(price|prices|quote|quoted|trading|trade|worth|cost|value|valued|how much|share price|stock price|ticker)\b"
+)
+# Comparisons ask for several quotes side by side
+COMPARE_PATTERN = re.compile(r"\b(compare|comparing|comparison|versus|vs|against)\b")
+# Market words that suggest a stock question even when no company was recognised
+MARKET_PATTERN = re.compile(r"\$[a-z]+|\b(stock|stocks|share|shares|equity|nasdaq|nyse|ticker|market cap)\b")
+# Words that make a query about stocks on their own, so the fast path may answer it
+STOCK_PATTERN = re.compile(r"\$[a-z]+|\b(stock|stocks|share prices?|shares|ticker|nasdaq|nyse|market cap)\b")
+TOKEN_PATTERN = re.compile(r"\$?[a-z0-9&]+(?:[.\-][a-z0-9&]+)*", re.IGNORECASE)
+
+# Words that are also tickers or the start of company names but, in a question, almost
+# never mean one
+COMMON_WORDS = frozenset("""
+a about all am an and any are as at be been best big but buy by can co day do does for from get go good has
+have hear how i if in is it its job key last live low me more most my new next now of on one or out own pay
+real run say see sell she so tell than that the their them then they this to top two up us was way we what
+when where which who why will with you your
+show give please draw plot chart charts graph price prices quote stock stocks share shares trading trend
+daily weekly monthly week month latest current today right much many over past few compare versus vs
+""".split())
+
+MAX_NAME_WORDS = 4
+MAX_SYMBOLS = 10
+MIN_FUZZY_LENGTH = 4
+
+
+# Whitespace and trailing punctuation only: case is kept because "ON" may be a ticker and "on" is not
+def normalize_query(query):
+    return " ".join(query.replace("’", "'").split()).strip(" ?!.")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.replace("'s ", " ").replace("'s", ""))
+
+
+# Single-word names recognised even when typed in lowercase ("tesla price")
+KNOWN_NAMES = frozenset(name.lower() for name in list(COMPANY_TO_SYMBOL) + list(COMPANY_ALIASES) if " " not in name)
+
+
+class CompanyIndex:
+    """
+    Finds the companies a query mentions, by ticker or by (part of) their listed name,
+    using a SymbolIndex. Names of up to MAX_NAME_WORDS words are matched as word n-grams,
+    longest first; if nothing matches, capitalized single words are tried as misspelt names.
+
+    A full listing turns ordinary words into tickers and names ("open" is Opendoor, "target"
+    is Target Corp), so case decides: tickers must be written in capitals or with a "$",
+    and a single word only names a company when it is capitalized or in known_names.
+    """
+
+    def __init__(self, symbol_index, known_names=KNOWN_NAMES):
+        self.symbol_index = symbol_index
+        self.known_names = known_names
+
+    def find(self, tokens):
+        """Return [(company, symbol)] mentioned in the tokens, in order of appearance."""
+        with telemetry.span("livestockiq.resolve_symbols", tokens=len(tokens)) as span:
+            lowered = [token.lower() for token in tokens]
+            found, i = [], 0
+            while i < len(tokens):
+                for n in range(min(MAX_NAME_WORDS, len(tokens) - i), 0, -1):
+                    listing = self._match(tokens[i], lowered[i:i + n])
+                    if listing is not None:
+                        if (listing.name, listing.symbol) not in found:
+                            found.append((listing.name, listing.symbol))
+                        i += n
+                        break
+                else:
+                    i += 1
+            if not found:
+                for token, word in zip(tokens, lowered):
+                    if len(word) >= MIN_FUZZY_LENGTH and word not in COMMON_WORDS and token[0].isupper():
+                        listing = self.symbol_index.resolve(word)
+                        if listing is not None:
+                            found.append((listing.name, listing.symbol))
+                            break
+            span.set(companies=len(found))
+            return found
+
+    def has_ticker(self, tokens):
+        """Whether a token is a listed ticker written as one: "$ON", or in capitals like "AAPL"."""
+        for token in tokens:
+            word = token.lstrip("$")
+            if not (token.startswith("$") or (token.isupper() and (len(word) > 1 or word.lower() not in COMMON_WORDS))):
+                continue
+            if self.symbol_index.lookup_ticker(word) is not None:
+                return True
+        return False
+
+    def _match(self, token, words):
+        if words[0] in COMMON_WORDS or words[-1] in COMMON_WORDS:
+            # Explicit tickers still count: "$ON", or a common word written in capitals like "ON"
+            if len(words) == 1 and (token.startswith("$") or (token.isupper() and len(token) > 1)):
+                return self.symbol_index.lookup_ticker(token.lstrip("$"))
+            return None
+        if len(words) == 1:
+            if token.startswith("$") or token.isupper():
+                listing = self.symbol_index.lookup_ticker(token.lstrip("$"))
+                if listing is not None:
+                    return listing
+            elif not token[0].isupper() and words[0] not in self.known_names:
+                return None  # "earn", "target": a word, not a company
+        return self.symbol_index.resolve(" ".join(words), fuzzy=False)
+
+
+def make_analysis(category, companies=(), interval=None):
+    """
+    The analysis dict the app consumes. companies is [(company, symbol)]; "company" and
+    "symbol" hold the first one for single-company queries.
+    """
+    companies = list(companies)[:MAX_SYMBOLS]
+    return {
+        "category": category,
+        "company": companies[0][0] if companies else None,
+        "interval": interval,
+        "symbol": companies[0][1] if companies else None,
+        "companies": [company for company, _ in companies],
+        "symbols": [symbol for _, symbol in companies],
+    }
+
+
+def classify_fast(query, company_index):
+    """
+    Classify a normalized query with patterns and the company index alone.
+    Returns the analysis dict, or None when the query needs the LLM.
+
+    Only unambiguous stock requests are answered here: a stock word ("stock", "share price",
+    "$TSLA"), an explicit interval ("weekly") or a chart word with a ticker ("AAPL chart").
+    "How much is a Tesla Model 3?" names a company and asks a price, but not of its stock.
+    """
+    lowered = query.lower()
+    interval_match = INTERVAL_PATTERN.search(lowered)
+    chart_word = CHART_PATTERN.search(lowered) is not None
+    wants_chart = interval_match is not None or chart_word or TREND_PATTERN.search(lowered) is not None
+    wants_price = PRICE_PATTERN.search(lowered) is not None or COMPARE_PATTERN.search(lowered) is not None
+    if not (wants_chart or wants_price or MARKET_PATTERN.search(lowered)):
+        # No sign of a price or chart request, even if a company is named ("Who is Apple's CEO?")
+        return make_analysis(GENERAL_QUERY)
+
+    tokens = tokenize(query)
+    if not (STOCK_PATTERN.search(lowered) or interval_match or (chart_word and company_index.has_ticker(tokens))):
+        return None
+    companies = company_index.find(tokens)
+    if not companies:
+        return None
+    if wants_chart:
+        interval_match = interval_match or INTERVAL_NOUN_PATTERN.search(lowered)
+        interval = INTERVALS[interval_match.group(1)[:3]] if interval_match else "Daily"
+        return make_analysis(STOCK_CHART, companies, interval)
+    return make_analysis(STOCK_PRICE, companies)
+
+
+class QueryRouter:
+    """
+    Routes a query to Stock Price / Stock Chart / General Query. The local classifier runs
+    first; llm_classify(query) is called only for queries it cannot resolve. Results are
+    memoized per normalized query, and counters show how often each path was taken.
+    """
+
+    def __init__(self, company_index, llm_classify, cache_size=4096):
+        self.company_index = company_index
+        self.llm_classify = llm_classify
+        self._cache = LRUCache(maxsize=cache_size)
+        self.stats = {"fast": 0, "llm": 0, "cache": 0}
+
+    def route(self, query):
+        started = time.perf_counter()
+        with telemetry.span("livestockiq.classify", query_chars=len(query)) as span:
+            key = normalize_query(query)
+            analysis = self._cache.get(key)
+            if analysis is not None:
+                route = "cache"
+            else:
+                analysis = classify_fast(key, self.company_index)
+                route = "fast"
+                if analysis is None:
+                    analysis = self.llm_classify(query)
+                    route = "llm"
+                self._cache[key] = analysis
+            span.set(route=route, category=analysis.get("category"), symbols=analysis.get("symbols") or [])
+        self.stats[route] += 1
+        return dict(analysis, route=route, route_ms=round((time.perf_counter() - started) * 1000, 3))
@@ -0,0 +1,314 @@
+"""
+On-disk ticker symbol index built from an Alpha Vantage LISTING_STATUS-style CSV
+(symbol,name,exchange,assetType,ipoDate,delistingDate,status).
+
+The index is a few sorted, tab-separated text files, each with an offsets file, read
+through mmap and binary-searched, so nothing is parsed at startup:
+  tickers.txt  SYMBOL -> name, exchange, asset type   (exact ticker lookup)
+  names.txt    normalized name -> SYMBOL              (exact and prefix lookup; a sorted array
+                                                       stands in for a trie)
+  deletes.txt  name with up to one character deleted -> normalized name (SymSpell-style
+                                                       candidates for typo-tolerant lookup)
+"""
+import bisect
+import csv
+import json
+import mmap
+import os
+import re
+from array import array
+from collections import namedtuple
+
+Listing = namedtuple("Listing", "symbol name exchange asset_type")
+
+# Words that do not help tell companies apart: "Apple Inc" and "Apple" are the same query
+NAME_SUFFIXES = frozenset(
+    "inc incorporated corp corporation co company ltd limited plc llc lp sa nv ag se the class common stock "
+    "shares ordinary adr ads".split()
+)
+WORD_PATTERN = re.compile(r"[a-z0-9&]+(?:\.[a-z0-9&]+)*")
+MAJOR_EXCHANGES = ("NYSE", "NASDAQ")
+MAX_FUZZY_LENGTH = 24
+
+
+def normalize_name(name):
+    words = WORD_PATTERN.findall(name.lower().replace("'s", ""))
+    kept = [word for word in words if word not in NAME_SUFFIXES]
+    # Single letters after the name are share classes ("Alphabet Inc - Class A")
+    while len(kept) > 1 and len(kept[-1]) == 1:
+        kept.pop()
+    return " ".join(kept or words)
+
+
+# Lower sorts first: common stock on a major exchange, then other stock, then funds
+def _rank(symbol, exchange, asset_type):
+    tier = 0 if asset_type == "Stock" and exchange in MAJOR_EXCHANGES else 1 if asset_type == "Stock" else 2
+    return f"{tier}{len(symbol):02d}"
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+# Optimal string alignment distance, giving up as soon as it exceeds max_distance
+def edit_distance(a, b, max_distance):
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+    return current[-1]
+
+
+def _write_sorted_lines(folder, name, lines):
+    lines = sorted(set(lines))
+    offsets = array("I", [0])
+    data_path = os.path.join(folder, name + ".txt")
+    with open(data_path + ".tmp", "wb") as f:
+        for line in lines:
+            encoded = line.encode("utf-8") + b"\n"
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    with open(os.path.join(folder, name + ".idx.tmp"), "wb") as f:
+        offsets.tofile(f)
+    os.replace(data_path + ".tmp", data_path)
+    os.replace(os.path.join(folder, name + ".idx.tmp"), os.path.join(folder, name + ".idx"))
+    return len(lines)
+
+
+def read_listing_csv(path, active_only=True):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if active_only and row.get("status", "Active") != "Active":
+                continue
+            if row.get("symbol") and row.get("name"):
+                yield row
+
+
+# Minimal listing rows for a {company name: symbol} dict, for use before a real listing is indexed
+def seed_rows(company_to_symbol):
+    return [{"symbol": symbol, "name": name, "exchange": "NASDAQ", "assetType": "Stock"}
+            for name, symbol in company_to_symbol.items()]
+
+
+def build_symbol_index(rows, folder, aliases=None):
+    """
+    Build the index in folder from listing rows (dicts with symbol, name, exchange, assetType).
+    aliases maps extra names (e.g. "Google") to a symbol that is in the listing.
+    """
+    os.makedirs(folder, exist_ok=True)
+    tickers, names, deletes, ranks = [], [], [], {}
+    for row in rows:
+        symbol = row["symbol"].strip().upper()
+        if "\t" in row["name"] or symbol in ranks:
+            continue
+        exchange, asset_type = row.get("exchange", ""), row.get("assetType", "Stock")
+        ranks[symbol] = _rank(symbol, exchange, asset_type)
+        tickers.append(f"{symbol}\t{row['name'].strip()}\t{exchange}\t{asset_type}")
+        names.append(f"{normalize_name(row['name'])}\t{ranks[symbol]}\t{symbol}")
+    # An alias outranks every listing that shares its name ("Alphabet" -> GOOGL, not GOOG)
+    for alias, symbol in (aliases or {}).items():
+        if symbol in ranks:
+            names.append(f"{normalize_name(alias)}\t000\t{symbol}")
+
+    for name in {line.split("\t", 1)[0] for line in names}:
+        if 0 < len(name) <= MAX_FUZZY_LENGTH:
+            deletes.append(f"{name}\t{name}")
+            deletes.extend(f"{variant}\t{name}" for variant in _deletes(name))
+
+    counts = {
+        "tickers": _write_sorted_lines(folder, "tickers", tickers),
+        "names": _write_sorted_lines(folder, "names", names),
+        "deletes": _write_sorted_lines(folder, "deletes", deletes),
+    }
+    with open(os.path.join(folder, "meta.json"), "w") as f:
+        json.dump(counts, f)
+    return counts
+
+
+class _SortedLines:
+    """A sorted text file read through mmap; lines are binary-searched on their first field."""
+
+    def __init__(self, folder, name):
+        self._data_path = os.path.join(folder, name + ".txt")
+        self._index_path = os.path.join(folder, name + ".idx")
+        self._data = None
+        self._offsets = None
+
+    def _open(self):
+        if self._offsets is not None:
+            return
+        with open(self._index_path, "rb") as f:
+            offsets = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("I")
+        if offsets[-1] == 0:
+            self._data = b""
+        else:
+            with open(self._data_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = offsets
+
+    def __len__(self):
+        self._open()
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        """The i-th line as a list of its tab-separated fields."""
+        return self._data[self._offsets[i]:self._offsets[i + 1] - 1].decode("utf-8").split("\t")
+
+    def key(self, i):
+        start = self._offsets[i]
+        end = self._data.find(b"\t", start, self._offsets[i + 1])
+        return self._data[start:end]
+
+    def _lower_bound(self, key):
+        return bisect.bisect_left(_KeyView(self), key)
+
+    def equal_range(self, key):
+        """Lines whose first field equals key."""
+        key = key.encode("utf-8")
+        self._open()
+        i = self._lower_bound(key)
+        while i < len(self) and self.key(i) == key:
+            yield self[i]
+            i += 1
+
+    def prefix_range(self, prefix, limit):
+        """Up to limit lines whose first field starts with prefix, in sorted order."""
+        prefix = prefix.encode("utf-8")
+        self._open()
+        i = self._lower_bound(prefix)
+        while i < len(self) and limit > 0 and self.key(i).startswith(prefix):
+            yield self[i]
+            i += 1
+            limit -= 1
+
+
+class _KeyView:
+    """Lets bisect search the keys of a _SortedLines without materializing them."""
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __getitem__(self, i):
+        return self._lines.key(i)
+
+
+class SymbolIndex:
+    """Ticker, name-prefix and fuzzy name lookup over an index built by build_symbol_index."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._tickers = _SortedLines(folder, "tickers")
+        self._names = _SortedLines(folder, "names")
+        self._deletes = _SortedLines(folder, "deletes")
+
+    @staticmethod
+    def exists(folder):
+        return os.path.exists(os.path.join(folder, "meta.json"))
+
+    def lookup_ticker(self, symbol):
+        for fields in self._tickers.equal_range(symbol.upper()):
+            return Listing(*fields)
+        return None
+
+    def _listings(self, name_lines):
+        # Name lines sort by (name, rank), so the preferred listing of a name comes first
+        return [self.lookup_ticker(fields[2]) for fields in name_lines]
+
+    def lookup_name(self, name):
+        """Listings whose normalized name is exactly name's, best first."""
+        return self._listings(self._names.equal_range(normalize_name(name)))
+
+    def prefix(self, text, limit=10):
+        """Listings whose normalized name starts with text."""
+        return self._listings(self._names.prefix_range(normalize_name(text), limit))
+
+    def fuzzy(self, text, max_distance=2, limit=5):
+        """
+        Listings whose normalized name is within max_distance edits of text, closest first.
+        Candidates are names sharing a one-character deletion with text, so every single
+        edit (and most double edits) is found.
+        """
+        query = normalize_name(text)
+        if not query or len(query) > MAX_FUZZY_LENGTH + 1:
+            return []
+        candidates = set()
+        for variant in _deletes(query) | {query}:
+            candidates.update(fields[1] for fields in self._deletes.equal_range(variant))
+        scored = sorted(
+            (distance, name) for name in candidates
+            if (distance := edit_distance(query, name, max_distance)) <= max_distance
+        )
+        listings = []
+        for _, name in scored[:limit]:
+            listings.extend(self._listings(self._names.equal_range(name))[:1])
+        return listings
+
+    def resolve(self, text, fuzzy=True):
+        """
+        Best listing for a company name or ticker: exact name, then a name that starts
+        with text as whole words ("Meta" -> "Meta Platforms"), then a fuzzy match.
+        """
+        name = normalize_name(text)
+        if not name:
+            return None
+        exact = self._listings(self._names.equal_range(name))
+        if exact:
+            return exact[0]
+        for boundary in (" ", "."):
+            lines = list(self._names.prefix_range(name + boundary, 50))
+            if lines:
+                # Only an unambiguous expansion counts: "Gold" could be any of several miners
+                best_tier = min(fields[1][0] for fields in lines)
+                best = {fields[2] for fields in lines if fields[1][0] == best_tier}
+                return self.lookup_ticker(best.pop()) if len(best) == 1 else None
+        if fuzzy and len(name) >= 4:
+            matches = self.fuzzy(name, max_distance=1 if len(name) < 8 else 2, limit=1)
+            if matches:
+                return matches[0]
+        return None
+
+
+def download_listing(api_key, path, base_url="https://www.alphavantage.co/query"):
+    import requests
+
+    response = requests.get(base_url, params={"function": "LISTING_STATUS", "apikey": api_key}, timeout=60)
+    response.raise_for_status()
+    text = response.text
+    if not text.startswith("symbol,"):
+        raise ValueError(f"Unexpected LISTING_STATUS response: {text[:200]}")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+
+
+# Build the index: python symbol_index.py [listing_status.csv] [index_folder]
+# The listing is downloaded with ALPHA_VANTAGE_API_KEY when the CSV does not exist yet.
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from dotenv import load_dotenv
+
+    from query_router import COMPANY_ALIASES
+
+    load_dotenv()
+    listing_path = sys.argv[1] if len(sys.argv) > 1 else "listing_status.csv"
+    index_folder = sys.argv[2] if len(sys.argv) > 2 else "symbol_index"
+    if not os.path.exists(listing_path):
+        download_listing(
+            os.getenv("ALPHA_VANTAGE_API_KEY"), listing_path,
+            os.getenv("ALPHA_VANTAGE_BASE_URL", "https://www.alphavantage.co/query"),
+        )
+    started = time.perf_counter()
+    built = build_symbol_index(read_listing_csv(listing_path), index_folder, COMPANY_ALIASES)
+    print(json.dumps(dict(built, seconds=round(time.perf_counter() - started, 2))))
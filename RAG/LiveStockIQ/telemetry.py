@@ -0,0 +1,14 @@
+"""
+Tracing and stage-latency metrics for this app, from stage_telemetry in ../../common (installed
+with this app's requirements). Find the slowest stage of each request in a file export with:
+    python telemetry.py telemetry.jsonl
+"""
+import os
+
+from stage_telemetry import main, record_span, setup, slowest_stages, span, wrap
+
+# Spans are tagged with the app folder's name unless OTEL_SERVICE_NAME says otherwise
+setup(os.path.basename(os.path.dirname(os.path.abspath(__file__))).lower())
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,30 @@
 import streamlit as st
-import zipfile
+import asyncio
 import os
-from docx import Document
-import PyPDF2
 from langchain.vectorstores import Chroma
 from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.schema import Document
 from langchain.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import ConversationalRetrievalChain
 from dotenv import load_dotenv
 import openai
-import json
 import re
+import shutil
 import smtplib
+import time
 from email.mime.text import MIMEText
+import telemetry
+from bulk_mailer import BulkMailer, SendStatus, make_job_id
+from chunk_store import ChunkStore, has_legacy_chunks, migrate_legacy_chunks
+from cv_summaries import SummaryCache, summarize_all, summarize_cached
+from cv_ranking import BM25Index, CVRanker, paginate
+from cv_extraction import extract_text, extract_texts
+from cv_sources import cv_stat, is_cv, iter_cv_sources, open_cv
+from embedding_stage import CachedEmbeddings, EmbeddingCache, EmbeddingStage
+from followup_context import build_followup_context
+from ingest_manifest import IngestManifest, make_chunk_id, settings_fingerprint
+from text_cache import ExtractedTextCache
+from vector_index import LocalVectorIndex, build_local_index
 
 
 # Load environment variables
@@ -26,6 +36,60 @@ client = openai.OpenAI(api_key = api_key )
 WORKING_FOLDER = "working_cvs"
 EMBEDDING_FOLDER = "embedding"
 CHUNKS_FOLDER = "chunks"
+MANIFEST_FILE = os.path.join(EMBEDDING_FOLDER, "ingest_manifest.json")
+
+# Chunking and embedding settings; changing any of them re-embeds every CV
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_DIMENSIONS = 1024
+
+# Uploads are copied to disk in blocks of this size
+UPLOAD_COPY_BUFFER = 1024 * 1024
+
+# Text extraction runs on a process pool; a file taking longer than this is skipped
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", os.cpu_count() or 1))
+EXTRACTION_TIMEOUT = int(os.getenv("EXTRACTION_TIMEOUT", "60"))
+
+# Chunks are embedded in batches, a few batches at a time; vectors are cached by chunk text
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBEDDING_CACHE_FILE = os.path.join(EMBEDDING_FOLDER, "embedding_cache.sqlite")
+
+# Extracted CV text, filled at ingest and reused by every session
+TEXT_CACHE_FILE = os.path.join(EMBEDDING_FOLDER, "extracted_text.sqlite")
+
+# CV summaries are cached by (text, prompt version, model); bulk runs are concurrency and rate limited
+SUMMARY_CACHE_FILE = os.path.join(EMBEDDING_FOLDER, "summaries.sqlite")
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+SUMMARY_REQUESTS_PER_MINUTE = int(os.getenv("SUMMARY_REQUESTS_PER_MINUTE", "300"))
+
+# Bumped by every ingest so open vector store handles know to reload
+STORE_VERSION_FILE = os.path.join(EMBEDDING_FOLDER, "store_version")
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+# Vector search backend: "chroma" or "local" (memory-mapped NumPy index, optional HNSW)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+LOCAL_INDEX_FOLDER = os.path.join(EMBEDDING_FOLDER, "local_index")
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float16")
+LOCAL_INDEX_APPROXIMATE = os.getenv("LOCAL_INDEX_APPROXIMATE", "false").lower() == "true"
+
+# Follow-up questions get the selected CV's most relevant chunks within this token budget;
+# CVs no longer than FOLLOWUP_FULL_TEXT_TOKENS are still sent whole
+FOLLOWUP_TOKEN_BUDGET = int(os.getenv("FOLLOWUP_TOKEN_BUDGET", "1500"))
+FOLLOWUP_TOP_K = int(os.getenv("FOLLOWUP_TOP_K", "8"))
+FOLLOWUP_FULL_TEXT_TOKENS = int(os.getenv("FOLLOWUP_FULL_TEXT_TOKENS", str(FOLLOWUP_TOKEN_BUDGET)))
+
+# Shortlist emails go out over a few persistent SMTP sessions at a capped rate; per-recipient
+# status lets an interrupted run resume. SMTP_STARTTLS=false allows a plain local SMTP stand-in.
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+BULK_EMAIL_WORKERS = int(os.getenv("BULK_EMAIL_WORKERS", "4"))
+BULK_EMAIL_PER_MINUTE = int(os.getenv("BULK_EMAIL_PER_MINUTE", "60"))
+EMAIL_STATUS_FILE = os.path.join(EMBEDDING_FOLDER, "email_status.sqlite")
+
+EMAIL_SUBJECT = "Your CV is shortlisted for [Position Name]"
+EMAIL_BODY = """Hi,\n\nGreetings from ABC.\n\nWe would like to inform you that your CV is shortlisted for [Position Name].\nWe would like to schedule a first round of interview with you. Please suggest a suitable date and time.\n\nRegards,\n[Your Name/Company Name]"""
 
 os.makedirs(WORKING_FOLDER, exist_ok=True)
 os.makedirs(EMBEDDING_FOLDER, exist_ok=True)
@@ -33,67 +97,204 @@ os.makedirs(CHUNKS_FOLDER, exist_ok=True)
 
 
 
-# Helper function to read PDF content using PyPDF2
-def read_pdf(file):
-    try:
-        # Use PyPDF2's PdfReader to read the file object directly
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
-    except Exception as e:
-        return f"Error reading PDF file: {str(e)}"
+# One extracted-text cache per process, shared by all Streamlit sessions
+@st.cache_resource
+def get_text_cache():
+    return ExtractedTextCache(TEXT_CACHE_FILE)
+
+
+# One embeddings client per process; document vectors and query vectors are both cached
+@st.cache_resource
+def get_embeddings():
+    return CachedEmbeddings(
+        OpenAIEmbeddings(model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS),
+        EmbeddingCache(EMBEDDING_CACHE_FILE, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS),
+        query_cache_size=QUERY_CACHE_SIZE,
+        query_ttl=QUERY_CACHE_TTL,
+    )
 
 
-# Helper function to extract text from Word document
-def read_docx(file):
+def read_store_version():
     try:
-        doc = Document(file)
-        return "\n".join([para.text for para in doc.paragraphs])
-    except Exception as e:
-        return f"Error reading Word file: {str(e)}"
+        with open(STORE_VERSION_FILE, "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "0"
+
+
+def publish_store_version():
+    tmp_path = STORE_VERSION_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, STORE_VERSION_FILE)
+
+
+# The vector store handle is shared by all sessions and reopened only after an ingest
+def get_vector_store():
+    return _open_vector_store(read_store_version())
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _open_vector_store(version):
+    if VECTOR_BACKEND == "local" and os.path.exists(os.path.join(LOCAL_INDEX_FOLDER, "current")):
+        return LocalVectorIndex(
+            LOCAL_INDEX_FOLDER, get_embeddings(), ChunkStore(CHUNKS_FOLDER), approximate=LOCAL_INDEX_APPROXIMATE
+        )
+    return Chroma(persist_directory=EMBEDDING_FOLDER, embedding_function=get_embeddings())
+
+
+@st.cache_resource
+def get_summary_cache():
+    return SummaryCache(SUMMARY_CACHE_FILE)
+
 
-# Response Generator
-def generator(user_query,context):
+# Per-CV ranking over the local index, rebuilt alongside the vector store handle
+def get_ranker():
+    return _open_ranker(read_store_version())
+
+
+@st.cache_resource(max_entries=1, show_spinner="Loading CV ranking index...")
+def _open_ranker(version):
+    if not os.path.exists(os.path.join(LOCAL_INDEX_FOLDER, "current")):
+        return None
+    chunk_store = ChunkStore(CHUNKS_FOLDER)
+    index = LocalVectorIndex(LOCAL_INDEX_FOLDER, get_embeddings(), chunk_store)
+    return CVRanker(index, BM25Index(index, chunk_store))
+
+
+# Raw CV bytes for the download button, read once per file version and kept for reruns
+def read_cv_bytes(file_path):
+    stat = cv_stat(file_path)
+    return _cached_cv_bytes(file_path, stat.st_size, stat.st_mtime_ns)
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _cached_cv_bytes(file_path, size, mtime_ns):
+    # open_cv reads a CV inside an archive from its member only
+    with open_cv(file_path) as f:
+        return f.read()
+
+
+def generator_messages(user_query, context):
     prompt = f"""
     You are an AI assistant. Below is the content of a CV:
     {context}
     Based on this CV content, answer the following query:
     "{user_query}"
     """
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[
-            {"role": "system",
-             "content": "You are a helpful assistant that answers queries based on CV content."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.2,
+    return [
+        {"role": "system",
+         "content": "You are a helpful assistant that answers queries based on CV content."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+# Stream a chat completion piece by piece, recording time to first token, tokens/s and usage in stats.
+# Closing the generator early (the page was left mid-answer) closes the HTTP stream.
+def stream_completion(stats, **request):
+    started, started_ns = time.perf_counter(), time.time_ns()
+    first_token_at, pieces = None, 0
+    stats["cancelled"] = True
+    response = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **request)
+    try:
+        for chunk in response:
+            if chunk.usage:
+                stats["prompt_tokens"] = chunk.usage.prompt_tokens
+                stats["completion_tokens"] = chunk.usage.completion_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    stats["ttft_s"] = round(first_token_at - started, 3)
+                pieces += 1
+                yield chunk.choices[0].delta.content
+        stats["cancelled"] = False
+    finally:
+        response.close()
+        finished_at = time.perf_counter()
+        stats["generation_s"] = round(finished_at - started, 3)
+        tokens = stats.get("completion_tokens") or pieces
+        if first_token_at is not None and tokens > 1 and finished_at > first_token_at:
+            stats["tokens_per_s"] = round((tokens - 1) / (finished_at - first_token_at), 1)
+        telemetry.record_span(
+            "openai.chat", started_ns, model=request.get("model"), stream=True, cancelled=stats["cancelled"],
+            prompt_tokens=stats.get("prompt_tokens"), completion_tokens=stats.get("completion_tokens"),
+            ttft_s=stats.get("ttft_s"), tokens_per_s=stats.get("tokens_per_s"),
+        )
+
+
+def generator_stream(user_query, context, stats):
+    return stream_completion(
+        stats, model="gpt-4-turbo", messages=generator_messages(user_query, context), temperature=0.2
     )
-    #st.subheader("Response:")
-    return response.choices[0].message.content
 
-# Summarizer Function
+
+# Answer a follow-up from the selected CV's relevant chunks. Returns the streamed answer and
+# per-call stats, which are complete once the stream has been read to the end.
+def answer_follow_up(question, file_name, text_content, scoped=True):
+    started = time.perf_counter()
+    with telemetry.span("smartrecruit.followup_context", scoped=scoped) as span:
+        if scoped:
+            context, stats = build_followup_context(
+                get_vector_store(), file_name, question, text_content,
+                token_budget=FOLLOWUP_TOKEN_BUDGET, k=FOLLOWUP_TOP_K, full_text_tokens=FOLLOWUP_FULL_TEXT_TOKENS,
+            )
+        else:
+            context, stats = text_content, {"mode": "full_text"}
+        span.set(mode=stats["mode"], context_tokens=stats.get("context_tokens"), chunks=stats.get("chunks"),
+                 context_chars=len(context))
+    stats["context_seconds"] = round(time.perf_counter() - started, 3)
+
+    def answer():
+        yield from generator_stream(question, context, stats)
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+
+    return answer(), stats
+
+# Summarizer Function; repeat summaries of the same CV text come from the cache
 def summarize_cv(context):
-    prompt = f"""
-    You are an AI assistant. Below is the content of a CV:
-    {context}
-    Summarize this CV in a few lines capturing the following:
-    - Highest education
-    - Number of years of experience
-    - Current working company
-    - Key technical skills
-    """
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that summarizes CV content."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.2,
+    return summarize_cached(client, get_summary_cache(), context)
+
+
+# Text of every ingested CV (or just file_names), from the extracted-text cache
+def ingested_cv_texts(file_names=None):
+    if file_names is None:
+        file_names = IngestManifest(MANIFEST_FILE).file_names()
+    texts = {}
+    for file_name in file_names:
+        try:
+            text = get_text_cache().get_or_extract(os.path.join(WORKING_FOLDER, file_name), extract_text)
+        except FileNotFoundError:
+            continue
+        if not text.startswith("Error reading"):
+            texts[file_name] = text
+    return texts
+
+
+# Summarize many CVs concurrently and show a throughput report
+def run_bulk_summaries(file_names=None):
+    texts = ingested_cv_texts(file_names)
+    progress_bar = st.progress(0.0, text=f"Summarizing {len(texts)} CV(s)...")
+
+    def show_progress(done, total):
+        progress_bar.progress(done / total, text=f"Summarized {done}/{total}")
+
+    summaries, report = asyncio.run(
+        summarize_all(
+            openai.AsyncOpenAI(api_key=api_key),
+            get_summary_cache(),
+            texts,
+            max_concurrency=SUMMARY_CONCURRENCY,
+            requests_per_minute=SUMMARY_REQUESTS_PER_MINUTE,
+            progress_callback=show_progress,
+        )
     )
-    return response.choices[0].message.content
+    progress_bar.empty()
+    st.success(
+        f"{report['summarized']} summarized, {report['cache_hits']} from cache, {report['failed']} failed "
+        f"in {report['seconds']}s ({report['cvs_per_second']} CVs/s, {report['tokens_saved']} tokens saved)."
+    )
+    return summaries
+
 
 # Email Sender Function
 def extract_email(content):
@@ -114,65 +315,213 @@ def send_email(to_email, subject, body):
         msg["To"] = to_email
 
         with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
+            if SMTP_STARTTLS:
+                server.starttls()
             server.login(smtp_user, smtp_password)
             server.sendmail(smtp_user, to_email, msg.as_string())
         return "Email sent successfully!"
     except Exception as e:
         return f"Failed to send email: {str(e)}"
 
-# Function to process CVs and store embeddings
-def process_and_embed_cvs():
-    documents = []
-    for file_name in os.listdir(WORKING_FOLDER):
-        file_path = os.path.join(WORKING_FOLDER, file_name)
-        if file_name.endswith(".pdf"):
-            with open(file_path, "rb") as pdf_file:
-                content = read_pdf(pdf_file)  # Pass file object
-        elif file_name.endswith(".docx"):
-            with open(file_path, "rb") as docx_file:
-                content = read_docx(docx_file)
-        else:
-            continue
 
-        if content.strip():
-            # Split the text into chunks
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-            chunks = text_splitter.split_text(content)
-
-            # Create Document objects for embedding and save each chunk with metadata
-            for i, chunk in enumerate(chunks):
-                # Add to documents for embedding
-                document = Document(page_content=chunk, metadata={"file_name": file_name})
-                documents.append(document)
-
-                # Write chunk content to a text file
-                chunk_file_name = f"{file_name}_chunk_{i + 1}.txt"
-                chunk_file_path = os.path.join(CHUNKS_FOLDER, chunk_file_name)
-                with open(chunk_file_path, "w", encoding="utf-8") as chunk_file:
-                    chunk_file.write(chunk)
-
-                # Write the Document object (content + metadata) to a JSON file
-                document_file_name = f"{file_name}_chunk_{i + 1}.json"
-                document_file_path = os.path.join(CHUNKS_FOLDER, document_file_name)
-                with open(document_file_path, "w", encoding="utf-8") as document_file:
-                    json.dump(
-                        {"page_content": document.page_content, "metadata": document.metadata},
-                        document_file,
-                        indent=4,
-                        ensure_ascii=False,
-                    )
+@st.cache_resource
+def get_email_status():
+    return SendStatus(EMAIL_STATUS_FILE)
+
+
+# Email every listed candidate that has an address in their CV. Each send is a new job
+# unless resume_job_id names an earlier one, whose candidates already mailed are skipped
+def send_bulk_emails(file_names, subject, body, resume_job_id=None):
+    texts = ingested_cv_texts(file_names)
+    messages = [(address, subject, body) for address in map(extract_email, texts.values()) if address]
+    no_address = len(file_names) - len(messages)
+    if not messages:
+        st.warning("None of the listed CVs contain an email address.")
+        return None
+
+    mailer = BulkMailer(
+        os.getenv("SMTP_SERVER"),
+        os.getenv("SMTP_PORT"),
+        os.getenv("SMTP_USER"),
+        os.getenv("SMTP_PASSWORD"),
+        starttls=SMTP_STARTTLS,
+        workers=BULK_EMAIL_WORKERS,
+        messages_per_minute=BULK_EMAIL_PER_MINUTE,
+        status=get_email_status(),
+    )
+    progress_bar = st.progress(0.0, text=f"Sending {len(messages)} email(s)...")
 
-    # Create embeddings and save them to ChromaDB
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large",
-        dimensions=1024
+    def show_progress(done, total):
+        progress_bar.progress(done / total, text=f"Sent {done}/{total}")
+
+    job_id = resume_job_id or make_job_id()
+    report = mailer.send_all(messages, job_id=job_id, progress_callback=show_progress)
+    progress_bar.empty()
+    st.success(
+        f"Job {job_id}: {report['sent']} sent, {report['skipped']} skipped (already sent in this job or duplicate), "
+        f"{len(report['failed'])} failed, {no_address} without an address, in {report['seconds']}s."
     )
-    db = Chroma(persist_directory=EMBEDDING_FOLDER, embedding_function=embeddings)
-    db.add_documents(documents)
-    db.persist()
+    if report["failed"]:
+        st.dataframe(
+            [{"Address": address, "Error": error} for address, error in report["failed"].items()],
+            use_container_width=True,
+        )
+    return report
+
+# Function to process CVs and store embeddings
+def process_and_embed_cvs(progress_callback=None):
+    with telemetry.span("smartrecruit.ingest") as ingest_span:
+        manifest = IngestManifest(MANIFEST_FILE)
+        settings = settings_fingerprint(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS,
+        )
 
-    return "Embeddings successfully created and stored!"
+        # Fingerprint every CV in the working folder, including CVs inside .zip archives
+        current_files, unsupported = iter_cv_sources(WORKING_FOLDER)
+
+        to_extract = [
+            file_name
+            for file_name, content_hash in current_files.items()
+            if not manifest.is_current(file_name, content_hash, settings)
+        ]
+        skipped = len(current_files) - len(to_extract)
+
+        chunk_store = ChunkStore(CHUNKS_FOLDER)
+        if has_legacy_chunks(CHUNKS_FOLDER):
+            migrate_legacy_chunks(CHUNKS_FOLDER, chunk_store, manifest.chunk_id_for)
+
+        # Deleted CVs lose their vectors, and so do changed CVs before they are re-embedded
+        stale_ids = []
+        purged = 0
+        changed = set(to_extract)
+        for file_name in manifest.file_names():
+            if file_name not in current_files or file_name in changed:
+                stale_ids.extend(manifest.remove(file_name))
+                purged += 1
+        chunk_store.delete(stale_ids)
+        chunk_store.flush()
+
+        embeddings = get_embeddings()
+        db = Chroma(persist_directory=EMBEDDING_FOLDER, embedding_function=embeddings)
+        if not manifest.entries and db.get(limit=1, include=[])["ids"]:
+            # Vectors from before the manifest have random IDs nothing can purge or overwrite: start
+            # the collection over (every CV is re-embedded this run; cached vectors cost no API calls)
+            db.delete_collection()
+            db = Chroma(persist_directory=EMBEDDING_FOLDER, embedding_function=embeddings)
+        if stale_ids:
+            db.delete(ids=stale_ids)
+        # Record the purge now so a later failure cannot leave the manifest pointing at deleted vectors
+        manifest.save()
+
+        text_cache = get_text_cache()
+        stage = EmbeddingStage(db, embeddings, batch_size=EMBED_BATCH_SIZE, max_concurrency=EMBED_CONCURRENCY)
+        extracted = {}
+        failed = 0
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        # CVs inside archives are tracked per archive for progress reporting
+        archive_totals = {}
+        for file_name in to_extract:
+            if "/" in file_name:
+                archive = file_name.split("/", 1)[0]
+                archive_totals[archive] = archive_totals.get(archive, 0) + 1
+        archive_done = dict.fromkeys(archive_totals, 0)
+
+        # Files are parsed in parallel and their chunks start embedding as soon as each one finishes
+        results = extract_texts(WORKING_FOLDER, to_extract, max_workers=EXTRACTION_WORKERS, timeout=EXTRACTION_TIMEOUT)
+        waiting_since = time.time_ns()
+        for done, (file_name, content) in enumerate(results, start=1):
+            # The extract span is the time spent waiting for the next parsed file
+            telemetry.record_span("smartrecruit.extract", waiting_since, file_name=file_name,
+                                  chars=len(content) if content else 0)
+            if progress_callback:
+                archive = file_name.split("/", 1)[0] if "/" in file_name else None
+                if archive:
+                    archive_done[archive] += 1
+                progress_callback(
+                    done, len(to_extract), file_name, archive, archive_done.get(archive), archive_totals.get(archive)
+                )
+
+            # Leave unreadable files out of the manifest so the next run retries them
+            if content is None or content.startswith("Error reading"):
+                failed += 1
+                waiting_since = time.time_ns()
+                continue
+
+            content_hash = current_files[file_name]
+            text_cache.put(os.path.join(WORKING_FOLDER, file_name), content, content_hash)
+            chunk_ids = []
+            if content.strip():
+                with telemetry.span("smartrecruit.chunk", file_name=file_name) as span:
+                    # Split the text into chunks
+                    chunks = text_splitter.split_text(content)
+                    span.set(chunks=len(chunks))
+
+                    # Queue each chunk for embedding and save it with metadata in the chunk store
+                    for i, chunk in enumerate(chunks):
+                        metadata = {"file_name": file_name, "chunk_index": i}
+                        chunk_id = make_chunk_id(file_name, content_hash, i)
+                        stage.add(chunk_id, chunk, metadata)
+                        chunk_store.put(chunk_id, chunk, metadata)
+                        chunk_ids.append(chunk_id)
+
+            extracted[file_name] = (content_hash, chunk_ids)
+            waiting_since = time.time_ns()
+
+        with telemetry.span("smartrecruit.embed_remaining"):
+            stats = stage.close()
+
+        # Only CVs whose every chunk reached the store count as embedded
+        added = 0
+        for file_name, (content_hash, chunk_ids) in extracted.items():
+            if stage.failed_ids.intersection(chunk_ids):
+                failed += 1
+                continue
+            manifest.record(file_name, content_hash, settings, chunk_ids)
+            added += 1
+
+        # Chunks no file owns (of CVs that failed to embed, or left over from older versions) are never purged otherwise
+        orphan_ids = list(set(chunk_store.index) - manifest.chunk_ids())
+        if orphan_ids:
+            chunk_store.delete(orphan_ids)
+            db.delete(ids=orphan_ids)
+        with telemetry.span("chroma.persist"):
+            db.persist()
+        chunk_store_changed = bool(stale_ids) or bool(extracted) or bool(orphan_ids)
+        if chunk_store.needs_compaction():
+            chunk_store.compact()
+        # The local index backs CV ranking, and similarity search too when VECTOR_BACKEND=local
+        if chunk_store_changed or not os.path.exists(os.path.join(LOCAL_INDEX_FOLDER, "current")):
+            with telemetry.span("smartrecruit.build_local_index", chunks=len(chunk_store)):
+                build_local_index(
+                    LOCAL_INDEX_FOLDER,
+                    chunk_store,
+                    embeddings.cache,
+                    EMBEDDING_DIMENSIONS,
+                    dtype=LOCAL_INDEX_DTYPE,
+                    with_hnsw=LOCAL_INDEX_APPROXIMATE,
+                )
+        chunk_store.close()
+        publish_store_version()
+        manifest.save()
+
+        result = (
+            f"Embeddings updated: {added} file(s) added, {skipped} skipped, {purged} purged, {failed} failed, "
+            f"{len(orphan_ids)} orphaned chunk(s) removed. "
+            f"{stats['chunks_written']} chunks at {stats['embeddings_per_second']}/s "
+            f"({stats['api_calls']} API calls, {stats['cache_hits']} cache hits)."
+        )
+        ingest_span.set(files=len(current_files), added=added, skipped=skipped, purged=purged, failed=failed,
+                        chunks_written=stats["chunks_written"], chunks_failed=stats["chunks_failed"],
+                        api_calls=stats["api_calls"], cache_hits=stats["cache_hits"])
+        if unsupported:
+            shown = ", ".join(unsupported[:10]) + (" ..." if len(unsupported) > 10 else "")
+            result += f" Skipped {len(unsupported)} unsupported archive member(s): {shown}"
+        if stats["errors"]:
+            result += f" {len(stats['errors'])} embedding batch(es) failed, first: {stats['errors'][0]}"
+        return result
 
 
 # Streamlit App
@@ -186,39 +535,95 @@ def main():
 
         # Upload multiple files (.pdf and .docx)
         uploaded_files = st.file_uploader(
-            "Upload multiple CVs (.pdf or .docx)",
-            type=["pdf", "docx"],
+            "Upload multiple CVs (.pdf, .docx or .zip)",
+            type=["pdf", "docx", "zip"],
             accept_multiple_files=True
         )
 
         if uploaded_files:
             for uploaded_file in uploaded_files:
-                # Save each file to the WORKING_FOLDER
+                # Save each file to the WORKING_FOLDER; archives are kept as-is, never unpacked
                 file_path = os.path.join(WORKING_FOLDER, uploaded_file.name)
                 with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
+                    shutil.copyfileobj(uploaded_file, f, UPLOAD_COPY_BUFFER)
             st.success(f"{len(uploaded_files)} file(s) successfully uploaded to {WORKING_FOLDER}!")
 
         # Embed button
         if st.button("🔠➡️🔢 Embed"):
-            result = process_and_embed_cvs()
+            progress_bar = st.progress(0.0, text="Extracting CV text...")
+
+            def show_progress(done, total, file_name, archive=None, archive_done=None, archive_total=None):
+                text = f"Extracted {done}/{total}: {file_name}"
+                if archive:
+                    text += f" ({archive}: {archive_done}/{archive_total})"
+                progress_bar.progress(done / total, text=text)
+
+            result = process_and_embed_cvs(progress_callback=show_progress)
+            progress_bar.empty()
             st.success(result)
 
+        # Pre-summarize every ingested CV so later summaries are instant
+        if st.button("📝 Summarize all CVs"):
+            run_bulk_summaries()
+
     # Main screen
     st.header("🔍 Query CVs 📄")
 
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-large",
-        dimensions=1024
-    )
-    db = Chroma(persist_directory=EMBEDDING_FOLDER, embedding_function=embeddings)
+    db = get_vector_store()
+
+    search_mode = st.radio("Search mode", ["Rank all CVs", "Top chunks"], horizontal=True)
+    ranker = get_ranker() if search_mode == "Rank all CVs" else None
+    if ranker:
+        col1, col2, col3, col4 = st.columns(4)
+        aggregate = col1.selectbox("Score per CV", ["max", "top_m"], help="Best chunk, or mean of the best m chunks")
+        top_m = col2.number_input("m", min_value=1, max_value=10, value=3)
+        bm25_weight = col3.slider("Keyword weight (BM25)", 0.0, 1.0, 0.3)
+        page_size = col4.number_input("CVs per page", min_value=5, max_value=200, value=20)
+    elif search_mode == "Rank all CVs":
+        st.info("Ranking needs the local index; click Embed to build it.")
 
     query = st.text_input("Ask a question to filter CVs (e.g., 'Show me all CVs with experience in Python')")
     if query:
-        # Perform semantic search
-        results = db.similarity_search(query, k=2)  # Top 10 results
-        print("********Results*******", results)
-        file_names = list(set([result.metadata["file_name"] for result in results]))
+        if ranker:
+            # Score every CV in one pass and show one page of the shortlist
+            with telemetry.span("smartrecruit.rank", aggregate=aggregate, bm25_weight=bm25_weight) as span:
+                ranked = ranker.rank(
+                    get_embeddings().embed_query(query), query, aggregate=aggregate, top_m=top_m, bm25_weight=bm25_weight
+                )
+                span.set(cvs=len(ranked))
+            page_count = max(1, -(-len(ranked) // page_size))
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+            page_results = paginate(ranked, page, page_size)
+            st.dataframe(
+                [{"CV": name, "Score": round(score, 4)} for name, score in page_results], use_container_width=True
+            )
+            file_names = [name for name, _ in page_results]
+        else:
+            # Perform semantic search
+            with telemetry.span("smartrecruit.similarity_search", backend=VECTOR_BACKEND, k=2) as span:
+                results = db.similarity_search(query, k=2)  # Top 10 results
+                # Most relevant CV first, each listed once
+                file_names = list(dict.fromkeys(result.metadata["file_name"] for result in results))
+                span.set(results=len(results), file_names=file_names)
+
+        if file_names and st.button("Summarize listed CVs"):
+            summaries = run_bulk_summaries(file_names)
+            st.dataframe(
+                [{"CV": name, "Summary": summaries.get(name, "")} for name in file_names], use_container_width=True
+            )
+
+        if file_names:
+            with st.expander("📧 Email listed candidates"):
+                bulk_subject = st.text_input("Subject", value=EMAIL_SUBJECT, key="bulk_subject")
+                bulk_body = st.text_area("Body", value=EMAIL_BODY, key="bulk_body")
+                jobs = {job_id: f"Resume {job_id}: {subject} ({sent} sent, {failed} failed)"
+                        for job_id, subject, sent, failed in get_email_status().recent_jobs()}
+                resume_job_id = st.selectbox(
+                    "Send as", [None] + list(jobs), format_func=lambda job_id: jobs.get(job_id, "New send"),
+                    help="Resuming skips the candidates that job already mailed",
+                )
+                if st.button("Send to all listed CVs"):
+                    send_bulk_emails(file_names, bulk_subject, bulk_body, resume_job_id)
 
         if file_names:
             st.sidebar.header("📂 Filtered CVs 🔍")
@@ -227,15 +632,10 @@ def main():
             if selected_cv:
                 file_path = os.path.join(WORKING_FOLDER, selected_cv)
 
-                # Read content of the selected CV for display
-                if selected_cv.endswith(".pdf"):
-                    with open(file_path, "rb") as pdf_file:
-                        content = pdf_file.read()  # Read in binary mode for download
-                        text_content = read_pdf(pdf_file)  # Extract text for display
-                elif selected_cv.endswith(".docx"):
-                    with open(file_path, "rb") as docx_file:
-                        content = docx_file.read()  # Read in binary mode for download
-                        text_content = read_docx(docx_file)  # Extract text for display
+                # Read content of the selected CV for display; the text is parsed once and cached
+                if is_cv(selected_cv):
+                    text_content = get_text_cache().get_or_extract(file_path, extract_text)
+                    content = read_cv_bytes(file_path)  # Binary content for download
                 else:
                     text_content = "Unsupported file type."
                     content = None
@@ -249,7 +649,7 @@ def main():
                     st.download_button(
                         label="Download Selected CV",
                         data=content,
-                        file_name=selected_cv,
+                        file_name=os.path.basename(selected_cv),
                         mime="application/octet-stream" if selected_cv.endswith(
                             ".pdf") else "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                     )
@@ -262,22 +662,26 @@ def main():
 
 
                 follow_up_query = st.text_input("Ask a follow-up question about this CV")
+                scoped = st.checkbox("Answer from the relevant parts of the CV only", value=True)
                 if st.button("Submit Query"):
                     if follow_up_query:
-                        response = generator(follow_up_query, text_content)
+                        response, stats = answer_follow_up(follow_up_query, selected_cv, text_content, scoped)
                         st.subheader("Response:")
-                        st.write(response)
+                        st.write_stream(response)
+                        st.caption(
+                            f"{stats['mode']}: {stats.get('prompt_tokens', '?')} prompt tokens "
+                            f"(CV is {stats.get('cv_tokens', '?')}), {stats.get('chunks', 0)} chunk(s), "
+                            f"first token in {stats.get('ttft_s', '?')}s, {stats.get('tokens_per_s', '?')} tokens/s, "
+                            f"answered in {stats['seconds']}s"
+                        )
                 # Send Email button
                 email_address = extract_email(text_content)
                 if email_address:
                     st.subheader("Send Email")
 
                     # Pre-filled subject and body
-                    email_subject = st.text_input("Email Subject:", value="Your CV is shortlisted for [Position Name]")
-                    email_body = st.text_area(
-                        "Email Body:",
-                        value=f"""Hi,\n\nGreetings from ABC.\n\nWe would like to inform you that your CV is shortlisted for [Position Name].\nWe would like to schedule a first round of interview with you. Please suggest a suitable date and time.\n\nRegards,\n[Your Name/Company Name]"""
-                    )
+                    email_subject = st.text_input("Email Subject:", value=EMAIL_SUBJECT)
+                    email_body = st.text_area("Email Body:", value=EMAIL_BODY)
 
                     if st.button("Send Email"):
                         if email_subject and email_body:
@@ -0,0 +1,87 @@
+"""
+Compare the Chroma store with the local vector index (exact and HNSW) on open time,
+query latency and recall@k. Exact local search is the ground truth.
+
+Queries are perturbed copies of stored chunk vectors, so no embedding API calls are made.
+
+    python benchmark_vector_index.py --queries 200 --k 10
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from langchain.vectorstores import Chroma
+
+from SmartRecruit import EMBEDDING_FOLDER, LOCAL_INDEX_FOLDER, get_embeddings
+from vector_index import LocalVectorIndex
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 3)
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def run_backend(name, search, queries, truth, k):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        ids, elapsed = timed(lambda: search(query))
+        latencies.append(elapsed)
+        recalls.append(len(set(ids) & expected) / len(expected))
+    return {
+        "backend": name,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    embeddings = get_embeddings()
+    exact, exact_open = timed(lambda: LocalVectorIndex(LOCAL_INDEX_FOLDER, embeddings))
+    approximate, approximate_open = timed(lambda: LocalVectorIndex(LOCAL_INDEX_FOLDER, embeddings, approximate=True))
+    chroma, chroma_open = timed(lambda: Chroma(persist_directory=EMBEDDING_FOLDER, embedding_function=embeddings))
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(exact), size=min(args.queries, len(exact)), replace=False)
+    queries = []
+    for row in rows:
+        vector = np.asarray(exact.vectors[row], dtype=np.float32)
+        vector = vector + rng.normal(scale=args.noise / np.sqrt(len(vector)), size=len(vector))
+        queries.append((vector / np.linalg.norm(vector)).astype(np.float32))
+
+    def local_ids(index, query):
+        found, _ = index._top_k(query, args.k)
+        return [index.chunk_ids[row].decode("ascii") for row in found]
+
+    def chroma_ids(query):
+        return chroma._collection.query(query_embeddings=[query.tolist()], n_results=args.k, include=[])["ids"][0]
+
+    truth = [set(local_ids(exact, query)) for query in queries]
+    results = [
+        dict(run_backend("local-exact", lambda q: local_ids(exact, q), queries, truth, args.k), open_ms=round(exact_open * 1000, 3)),
+        dict(run_backend("chroma", chroma_ids, queries, truth, args.k), open_ms=round(chroma_open * 1000, 3)),
+    ]
+    if approximate.hnsw is not None:
+        results.append(
+            dict(run_backend("local-hnsw", lambda q: local_ids(approximate, q), queries, truth, args.k), open_ms=round(approximate_open * 1000, 3))
+        )
+
+    print(json.dumps({"chunks": len(exact), "queries": len(queries), "k": args.k, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import queue
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from email.mime.text import MIMEText
+
+from token_bucket import TokenBucket
+
+# Errors after which the session is rebuilt and the message retried once. smtplib errors
+# are OSErrors too, so protocol-level rejections must be caught before these.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+
+# A fresh id per send: reusing a subject/body for a new shortlist must not skip anyone,
+# so a job is only resumed when its id is passed again
+def make_job_id():
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+
+class SendStatus:
+    """
+    Per-recipient send status for each job, so an interrupted job can be resumed
+    without mailing anyone twice. recent_jobs() lists the jobs to offer for resuming.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sends "
+            "(job_id TEXT, address TEXT, status TEXT, error TEXT, updated REAL, PRIMARY KEY (job_id, address))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, subject TEXT, created REAL)")
+        self._conn.commit()
+
+    def start_job(self, job_id, subject):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, subject, created) VALUES (?, ?, ?)", (job_id, subject, time.time())
+            )
+            self._conn.commit()
+
+    def recent_jobs(self, limit=20):
+        """[(job_id, subject, sent, failed)], newest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT jobs.job_id, jobs.subject, COUNT(CASE WHEN status = 'sent' THEN 1 END), "
+                "COUNT(CASE WHEN status = 'failed' THEN 1 END) "
+                "FROM jobs LEFT JOIN sends ON sends.job_id = jobs.job_id "
+                "GROUP BY jobs.job_id ORDER BY jobs.created DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def sent_addresses(self, job_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT address FROM sends WHERE job_id = ? AND status = 'sent'", (job_id,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def record(self, job_id, address, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sends (job_id, address, status, error, updated) VALUES (?, ?, ?, ?, ?)",
+                (job_id, address, status, error, time.time()),
+            )
+            self._conn.commit()
+
+
+class BulkMailer:
+    """
+    Sends many emails over a small pool of persistent SMTP sessions. Each worker thread
+    keeps its own logged-in session, reconnects when it drops, and all workers share one
+    token bucket so the overall send rate stays under messages_per_minute.
+    """
+
+    def __init__(self, host, port, user=None, password=None, starttls=True, workers=4,
+                 messages_per_minute=60, messages_per_session=100, status=None, timeout=30):
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.workers = workers
+        self.messages_per_session = messages_per_session
+        self.timeout = timeout
+        self.bucket = TokenBucket.per_minute(messages_per_minute, burst=workers)
+        self.status = status
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    @staticmethod
+    def _close(server):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _message(self, to_email, subject, body):
+        msg = MIMEText(body)
+        msg["Subject"] = subject
+        msg["From"] = self.user or ""
+        msg["To"] = to_email
+        return msg.as_string()
+
+    def _worker(self, jobs, results):
+        server, sent_on_session = None, 0
+        while True:
+            item = jobs.get()
+            if item is None:
+                break
+            address, subject, body = item
+            self.bucket.acquire()
+            error = None
+            for attempt in range(2):
+                try:
+                    if server is None or sent_on_session >= self.messages_per_session:
+                        self._close(server)
+                        server, sent_on_session = self._connect(), 0
+                    server.sendmail(self.user or "", address, self._message(address, subject, body))
+                    sent_on_session += 1
+                    error = None
+                    break
+                except CONNECTION_ERRORS as e:
+                    error = str(e)
+                    self._close(server)
+                    server = None
+                except smtplib.SMTPException as e:
+                    error = str(e)  # Refused recipient or message: retrying will not help
+                    break
+                except OSError as e:
+                    error = str(e)  # Socket-level drop or timeout
+                    self._close(server)
+                    server = None
+            results.put((address, error))
+        self._close(server)
+
+    def send_all(self, messages, job_id=None, progress_callback=None):
+        """
+        Send [(address, subject, body)] and return a report. Without a job_id this is a new
+        job; with the id of an earlier job (and a status store), every address already
+        marked sent for it is skipped.
+        """
+        if job_id is None:
+            job_id = make_job_id()
+        already_sent = set()
+        if self.status:
+            self.status.start_job(job_id, messages[0][1] if messages else "")
+            already_sent = self.status.sent_addresses(job_id)
+        # One message per address per job, even if the shortlist repeats a candidate
+        pending, seen = [], set(already_sent)
+        for address, subject, body in messages:
+            if address not in seen:
+                seen.add(address)
+                pending.append((address, subject, body))
+
+        report = {"job_id": job_id, "total": len(messages), "skipped": len(messages) - len(pending),
+                  "sent": 0, "failed": {}}
+        started = time.monotonic()
+        jobs = queue.Queue(maxsize=self.workers * 2)  # Bounded: the producer waits for the workers
+        results = queue.Queue()
+        threads = [threading.Thread(target=self._worker, args=(jobs, results), daemon=True)
+                   for _ in range(max(1, min(self.workers, len(pending))))]
+        for thread in threads:
+            thread.start()
+
+        def produce():
+            for item in pending:
+                jobs.put(item)
+            for _ in threads:
+                jobs.put(None)
+
+        threading.Thread(target=produce, daemon=True).start()
+        for done in range(1, len(pending) + 1):
+            address, error = results.get()
+            if error:
+                report["failed"][address] = error
+            else:
+                report["sent"] += 1
+            # Recorded as each message completes, so a crash loses at most the in-flight ones
+            if self.status:
+                self.status.record(job_id, address, "failed" if error else "sent", error)
+            if progress_callback:
+                progress_callback(done, len(pending))
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.monotonic() - started
+        report["seconds"] = round(elapsed, 2)
+        report["messages_per_second"] = round(report["sent"] / elapsed, 2) if elapsed else 0.0
+        return report
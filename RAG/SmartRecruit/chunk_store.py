@@ -0,0 +1,254 @@
+import json
+import os
+import re
+import sys
+import threading
+
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{6})\.jsonl$")
+LEGACY_CHUNK_PATTERN = re.compile(r"^(?P<file_name>.+)_chunk_(?P<number>\d+)\.json$")
+INDEX_FILE = "index.tsv"
+
+
+class ChunkStore:
+    """
+    Append-only chunk store: chunks are JSON lines in size-capped segment files, and
+    index.tsv maps each chunk ID to (segment, offset, length). Deletes append a
+    tombstone to the index; compact() rewrites only the live chunks.
+    """
+
+    def __init__(self, folder, segment_max_bytes=64 * 1024 * 1024):
+        self.folder = folder
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(folder, exist_ok=True)
+        self.index_path = os.path.join(folder, INDEX_FILE)
+        self._readers = {}
+        self._read_lock = threading.Lock()
+        self._writer = None
+        self._index_writer = None
+        self._load_index()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.folder, f"segment-{segment:06d}.jsonl")
+
+    def _segments(self):
+        numbers = []
+        for name in os.listdir(self.folder):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _load_index(self):
+        self.index = {}
+        self.dead_bytes = 0
+        self._index_pos = 0
+        self._index_inode = None
+        self.refresh()
+
+    # Pick up index lines appended by another process since the last read
+    def refresh(self):
+        if not os.path.exists(self.index_path):
+            return
+        stat = os.stat(self.index_path)
+        if self._index_inode is not None and stat.st_ino != self._index_inode:
+            # The index was swapped by a compaction: start over
+            self._close_readers()
+            self._index_inode = None
+            self._load_index()
+            return
+        self._index_inode = stat.st_ino
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partially written line; read it next time
+                self._index_pos += len(line)
+                fields = line.decode("utf-8").rstrip("\n").split("\t")
+                old = self.index.pop(fields[0], None)
+                if old:
+                    self.dead_bytes += old[2]
+                if fields[1] != "-":
+                    self.index[fields[0]] = (int(fields[1]), int(fields[2]), int(fields[3]))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.index
+
+    def _open_writer(self, segment):
+        self._writer = (segment, open(self._segment_path(segment), "ab"))
+        if self._index_writer is None:
+            self._index_writer = open(self.index_path, "ab")
+
+    def put(self, chunk_id, page_content, metadata):
+        if self._writer is None:
+            segments = self._segments()
+            self._open_writer(segments[-1] if segments else 1)
+        if self._writer[1].tell() >= self.segment_max_bytes:
+            # Roll over to a new segment once the current one is full
+            self._writer[1].close()
+            self._open_writer(self._writer[0] + 1)
+        segment, f = self._writer
+        record = json.dumps(
+            {"id": chunk_id, "page_content": page_content, "metadata": metadata}, ensure_ascii=False
+        ).encode("utf-8") + b"\n"
+        offset = f.tell()
+        f.write(record)
+        old = self.index.get(chunk_id)
+        if old:
+            self.dead_bytes += old[2]
+        self.index[chunk_id] = (segment, offset, len(record))
+        self._index_writer.write(f"{chunk_id}\t{segment}\t{offset}\t{len(record)}\n".encode("utf-8"))
+
+    def delete(self, chunk_ids):
+        if self._index_writer is None:
+            self._index_writer = open(self.index_path, "ab")
+        for chunk_id in chunk_ids:
+            old = self.index.pop(chunk_id, None)
+            if old:
+                self.dead_bytes += old[2]
+                self._index_writer.write(f"{chunk_id}\t-\n".encode("utf-8"))
+
+    def flush(self):
+        # Segment data goes to disk before the index entries that point at it
+        if self._writer:
+            self._writer[1].flush()
+        if self._index_writer:
+            self._index_writer.flush()
+            self._index_pos = self._index_writer.tell()
+            self._index_inode = os.stat(self.index_path).st_ino
+
+    def _read(self, segment, offset, length):
+        # Readers are shared file handles, so seek+read must not interleave across threads
+        with self._read_lock:
+            reader = self._readers.get(segment)
+            if reader is None:
+                reader = self._readers[segment] = open(self._segment_path(segment), "rb")
+            reader.seek(offset)
+            data = reader.read(length)
+        return json.loads(data)
+
+    def get(self, chunk_id):
+        location = self.index.get(chunk_id)
+        if location is None:
+            return None
+        if self._writer and self._writer[0] == location[0]:
+            self._writer[1].flush()
+        return self._read(*location)
+
+    # Stream every live chunk in storage order, one segment line at a time
+    def iter_chunks(self):
+        self.flush()
+        for segment in self._segments():
+            offset = 0
+            with open(self._segment_path(segment), "rb") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if self.index.get(record["id"]) == (segment, offset, len(line)):
+                        yield record
+                    offset += len(line)
+
+    def needs_compaction(self, max_dead_ratio=0.3):
+        live_bytes = sum(length for _, _, length in self.index.values())
+        return self.dead_bytes > max_dead_ratio * (live_bytes + self.dead_bytes)
+
+    def compact(self):
+        """
+        Copy live chunks into fresh segments, swap in a rebuilt index and drop the
+        old segments. Returns the number of bytes reclaimed.
+        """
+        self.flush()
+        old_segments = self._segments()
+        next_segment = (old_segments[-1] + 1) if old_segments else 1
+        reclaimed = self.dead_bytes
+
+        live = sorted(self.index.items(), key=lambda item: item[1])
+        new_index = {}
+        f = open(self._segment_path(next_segment), "wb")
+        for chunk_id, location in live:
+            if f.tell() >= self.segment_max_bytes:
+                f.close()
+                next_segment += 1
+                f = open(self._segment_path(next_segment), "wb")
+            reader = self._readers.get(location[0])
+            if reader is None:
+                reader = self._readers[location[0]] = open(self._segment_path(location[0]), "rb")
+            reader.seek(location[1])
+            record = reader.read(location[2])
+            new_index[chunk_id] = (next_segment, f.tell(), len(record))
+            f.write(record)
+        f.close()
+
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            for chunk_id, (segment, offset, length) in new_index.items():
+                index_file.write(f"{chunk_id}\t{segment}\t{offset}\t{length}\n")
+        self.close()
+        os.replace(tmp_path, self.index_path)
+        for segment in old_segments:
+            os.remove(self._segment_path(segment))
+        self._load_index()
+        return reclaimed
+
+    def _close_readers(self):
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+
+    def close(self):
+        self.flush()
+        if self._writer:
+            self._writer[1].close()
+            self._writer = None
+        if self._index_writer:
+            self._index_writer.close()
+            self._index_writer = None
+        self._close_readers()
+
+
+def has_legacy_chunks(folder):
+    return any(LEGACY_CHUNK_PATTERN.match(name) for name in os.listdir(folder))
+
+
+def migrate_legacy_chunks(folder, store, chunk_id_for):
+    """
+    Move the old per-chunk <file>_chunk_<n>.json/.txt dumps in folder into store.
+    chunk_id_for(file_name, index) gives the ID each chunk was embedded under, or None for
+    files ingested before the manifest existed: nothing would ever purge those chunks, and
+    the next ingest extracts those files again anyway, so they are dropped.
+    """
+    migrated = 0
+    for name in sorted(os.listdir(folder)):
+        match = LEGACY_CHUNK_PATTERN.match(name)
+        if not match:
+            continue
+        index = int(match.group("number")) - 1
+        chunk_id = chunk_id_for(match.group("file_name"), index)
+        if chunk_id is None:
+            continue
+        path = os.path.join(folder, name)
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        metadata = dict(document.get("metadata", {}), chunk_index=index)
+        store.put(chunk_id, document["page_content"], metadata)
+        migrated += 1
+    store.flush()
+
+    # Only remove the old files once everything is safely in the store
+    for name in os.listdir(folder):
+        if LEGACY_CHUNK_PATTERN.match(name) or re.match(r"^.+_chunk_\d+\.txt$", name):
+            os.remove(os.path.join(folder, name))
+    return migrated
+
+
+# One-shot migration: python chunk_store.py [chunks_folder] [manifest_file]
+if __name__ == "__main__":
+    from ingest_manifest import IngestManifest
+
+    chunks_folder = sys.argv[1] if len(sys.argv) > 1 else "chunks"
+    manifest = IngestManifest(sys.argv[2] if len(sys.argv) > 2 else os.path.join("embedding", "ingest_manifest.json"))
+    chunk_store = ChunkStore(chunks_folder)
+    count = migrate_legacy_chunks(chunks_folder, chunk_store, manifest.chunk_id_for)
+    chunk_store.close()
+    print(f"Migrated {count} chunk(s) into {chunks_folder}")
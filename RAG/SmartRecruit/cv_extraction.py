@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+from docx import Document
+
+from cv_sources import open_cv
+
+
+# Helper function to read PDF content using PyPDF2
+def read_pdf(file):
+    try:
+        # Use PyPDF2's PdfReader to read the file object directly
+        pdf_reader = PyPDF2.PdfReader(file)
+        # Join once at the end; repeated += copies the whole text for every page
+        return "".join(page.extract_text() or "" for page in pdf_reader.pages)
+    except Exception as e:
+        return f"Error reading PDF file: {str(e)}"
+
+
+# Helper function to extract text from Word document
+def read_docx(file):
+    try:
+        doc = Document(file)
+        return "\n".join([para.text for para in doc.paragraphs])
+    except Exception as e:
+        return f"Error reading Word file: {str(e)}"
+
+
+# Extract the text of one CV, on disk or inside an archive (runs inside a worker process)
+def extract_text(cv_path):
+    with open_cv(cv_path) as f:
+        if cv_path.lower().endswith(".pdf"):
+            return read_pdf(f)
+        return read_docx(f)
+
+
+# Pool initializer: each worker reports its pid so a stuck pool can be killed
+def _register_worker(worker_pids):
+    worker_pids.put(os.getpid())
+
+
+def _stop_pool(pool, worker_pids, kill):
+    pool.shutdown(wait=False, cancel_futures=True)
+    if kill:
+        # A worker stuck on a malformed file never returns, so terminate it
+        while not worker_pids.empty():
+            try:
+                os.kill(worker_pids.get(), signal.SIGTERM)
+            except OSError:
+                pass  # Already gone, e.g. the worker that broke the pool
+    else:
+        pool.shutdown(wait=True)
+
+
+def extract_texts(folder, cv_names, max_workers=None, timeout=60):
+    """
+    Extract CV text over a process pool and yield (cv_name, text) as each CV finishes.
+    text is None when the file timed out or crashed its worker. Either only costs the
+    offending file: the pool is restarted and the other in-flight files are retried. A
+    crash does not say which file caused it, so the files that were in flight are retried
+    one at a time, and only the one that crashes again on its own yields None.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    pending = deque(cv_names)
+    suspects = set()  # In flight when a worker crashed; each is retried alone
+    # spawn keeps workers clear of the Streamlit server's threads
+    context = multiprocessing.get_context("spawn")
+
+    while pending:
+        worker_pids = context.SimpleQueue()
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                   initializer=_register_worker, initargs=(worker_pids,))
+        in_flight = {}
+        restart = crashed = False
+        try:
+            while pending or in_flight:
+                # Keep at most one file per worker in flight so the deadline tracks run time
+                while pending and len(in_flight) < max_workers:
+                    if in_flight and (pending[0] in suspects or suspects.intersection(
+                            cv_name for cv_name, _ in in_flight.values())):
+                        break
+                    cv_name = pending.popleft()
+                    future = pool.submit(extract_text, os.path.join(folder, cv_name))
+                    in_flight[future] = (cv_name, time.monotonic() + timeout)
+
+                next_deadline = min(deadline for _, deadline in in_flight.values())
+                done, _ = wait(
+                    in_flight,
+                    timeout=max(0.0, next_deadline - time.monotonic()),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    cv_name, _ = in_flight.pop(future)
+                    try:
+                        text = future.result()
+                    except BrokenProcessPool:
+                        # A worker died (e.g. a crashing parser); the pool must be rebuilt
+                        restart = crashed = True
+                        if cv_name not in suspects:
+                            suspects.add(cv_name)
+                            pending.appendleft(cv_name)
+                            continue
+                        text = None
+                    except Exception:
+                        text = None
+                    suspects.discard(cv_name)
+                    yield cv_name, text
+
+                now = time.monotonic()
+                expired = [f for f, (_, deadline) in in_flight.items() if deadline <= now]
+                for future in expired:
+                    cv_name, _ = in_flight.pop(future)
+                    suspects.discard(cv_name)
+                    yield cv_name, None
+                if expired or restart:
+                    # Requeue the healthy files that shared the pool with the stuck one
+                    for cv_name, _ in in_flight.values():
+                        pending.appendleft(cv_name)
+                        if crashed:
+                            suspects.add(cv_name)
+                    restart = True
+                    break
+        finally:
+            _stop_pool(pool, worker_pids, kill=restart or bool(in_flight))
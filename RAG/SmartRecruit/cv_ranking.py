@@ -0,0 +1,112 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#.]+")
+
+
+def tokenize(text):
+    return [token.strip(".") for token in TOKEN_PATTERN.findall(text.lower()) if token.strip(".")]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of a LocalVectorIndex, with rows aligned to the index so
+    keyword and vector scores can be combined per row.
+    """
+
+    def __init__(self, index, chunk_store, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(index)
+        row_of = {index.chunk_ids[row].decode("ascii"): row for row in range(len(index))}
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for record in chunk_store.iter_chunks():
+            row = row_of.get(record["id"])
+            if row is None:
+                continue
+            counts = Counter(tokenize(record["page_content"]))
+            lengths[row] = sum(counts.values())
+            for term, count in counts.items():
+                rows, tfs = postings[term]
+                rows.append(row)
+                tfs.append(count)
+        self.postings = {
+            term: (np.array(rows, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            for term, (rows, tfs) in postings.items()
+        }
+        self.norm = self.k1 * (1 - self.b + self.b * lengths / (lengths.mean() if self.size else 1.0))
+
+    def score_all(self, query):
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, tfs = self.postings[term]
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + self.norm[rows])
+        return scores
+
+
+class CVRanker:
+    """
+    Scores every CV in one vectorized pass: chunk similarities are aggregated per file
+    (max, or mean of the top m chunks), optionally fused with BM25 keyword scores.
+    """
+
+    def __init__(self, index, bm25=None):
+        self.index = index
+        self.bm25 = bm25
+        self.file_ids = np.asarray(index.file_ids)
+        self.file_count = len(index.file_names)
+        self.file_names = np.array(index.file_names, dtype=str)
+        # Rows grouped by file once, so per-file reductions are a single reduceat
+        self.order = np.argsort(self.file_ids, kind="stable")
+        grouped = self.file_ids[self.order]
+        self.group_files = np.unique(grouped)
+        self.group_starts = np.searchsorted(grouped, self.group_files)
+
+    def _per_file(self, row_scores, aggregate, top_m):
+        per_file = np.full(self.file_count, -np.inf, dtype=np.float32)
+        if len(row_scores) == 0:
+            return per_file
+        if aggregate == "max":
+            per_file[self.group_files] = np.maximum.reduceat(row_scores[self.order], self.group_starts)
+            return per_file
+
+        # Top-m mean: sort by (file, score desc) and keep each file's first m rows
+        by_score = np.lexsort((-row_scores, self.file_ids))
+        files = self.file_ids[by_score]
+        starts = np.searchsorted(files, files)
+        keep = (np.arange(len(files)) - starts) < top_m
+        sums = np.bincount(files[keep], weights=row_scores[by_score][keep], minlength=self.file_count)
+        counts = np.bincount(files[keep], minlength=self.file_count)
+        has_rows = counts > 0
+        per_file[has_rows] = (sums[has_rows] / counts[has_rows]).astype(np.float32)
+        return per_file
+
+    def rank(self, query_vector, query_text="", aggregate="max", top_m=3, bm25_weight=0.0):
+        """
+        Return every CV as (file_name, score), best first. Ties are broken by file name
+        so pages stay stable between reruns.
+        """
+        per_file = self._per_file(self.index.score_all(query_vector), aggregate, top_m)
+        if self.bm25 is not None and bm25_weight > 0 and query_text:
+            keyword = self._per_file(self.bm25.score_all(query_text), aggregate, top_m)
+            keyword[~np.isfinite(keyword)] = 0.0
+            peak = keyword.max() if len(keyword) else 0.0
+            if peak > 0:
+                keyword /= peak
+            per_file = (1 - bm25_weight) * per_file + bm25_weight * keyword
+
+        ranked = np.flatnonzero(np.isfinite(per_file))
+        ranked = ranked[np.lexsort((self.file_names[ranked], -per_file[ranked]))]
+        return [(str(self.file_names[i]), float(per_file[i])) for i in ranked]
+
+
+def paginate(ranked, page, page_size):
+    start = (page - 1) * page_size
+    return ranked[start:start + page_size]
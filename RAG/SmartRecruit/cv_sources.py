@@ -0,0 +1,123 @@
+"""
+CV sources: plain .pdf/.docx files in the working folder and CVs inside (possibly nested)
+.zip archives. A CV inside an archive is addressed by a virtual path such as
+working_cvs/batch.zip/2024/cv.pdf and is read straight from the archive, never unpacked.
+"""
+import io
+import os
+import zipfile
+from contextlib import ExitStack, contextmanager
+
+from ingest_manifest import file_content_hash
+
+CV_EXTENSIONS = (".pdf", ".docx")
+ARCHIVE_EXTENSION = ".zip"
+
+
+def is_cv(name):
+    return name.lower().endswith(CV_EXTENSIONS)
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_EXTENSION)
+
+
+# Read one archive member into memory; memory use is bounded by that member's size
+def _member_stream(archive, member):
+    with archive.open(member) as f:
+        return io.BytesIO(f.read())
+
+
+def _walk_archive(archive, prefix, sources, skipped):
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = f"{prefix}/{info.filename}"
+        if is_cv(info.filename):
+            # The member CRC and size identify its content without decompressing it
+            sources[name] = f"crc32:{info.CRC:08x}:{info.file_size}"
+        elif is_archive(info.filename):
+            try:
+                with zipfile.ZipFile(_member_stream(archive, info)) as nested:
+                    _walk_archive(nested, name, sources, skipped)
+            except zipfile.BadZipFile:
+                skipped.append(name)
+        else:
+            skipped.append(name)
+
+
+def iter_cv_sources(folder):
+    """
+    Return ({cv_name: content fingerprint}, [skipped archive members]) for the folder.
+    cv_name is relative to folder; archive members use '/' separated virtual paths.
+    """
+    sources, skipped = {}, []
+    for file_name in sorted(os.listdir(folder)):
+        file_path = os.path.join(folder, file_name)
+        if is_cv(file_name):
+            sources[file_name] = file_content_hash(file_path)
+        elif is_archive(file_name):
+            try:
+                with zipfile.ZipFile(file_path) as archive:
+                    _walk_archive(archive, file_name, sources, skipped)
+            except zipfile.BadZipFile:
+                skipped.append(file_name)
+    return sources, skipped
+
+
+# Split a virtual path into the archive file on disk and the member path inside it
+def _split_archive_path(cv_path):
+    path = cv_path.replace(os.sep, "/")
+    start = 0
+    while True:
+        end = path.lower().find(ARCHIVE_EXTENSION + "/", start)
+        if end < 0:
+            raise FileNotFoundError(cv_path)
+        end += len(ARCHIVE_EXTENSION)
+        if os.path.isfile(path[:end]):
+            return path[:end], path[end + 1:]
+        start = end
+
+
+def _resolve_member(stack, archive, member_path):
+    """Return (innermost archive, member name), opening nested archives one level at a time."""
+    if member_path in archive.NameToInfo:
+        return archive, member_path
+    parts = member_path.split("/")
+    for i in range(1, len(parts)):
+        inner = "/".join(parts[:i])
+        if is_archive(inner) and inner in archive.NameToInfo:
+            nested = stack.enter_context(zipfile.ZipFile(_member_stream(archive, inner)))
+            return _resolve_member(stack, nested, "/".join(parts[i:]))
+    raise FileNotFoundError(member_path)
+
+
+@contextmanager
+def open_cv(cv_path):
+    """Open a CV on disk or inside an archive as a seekable binary file."""
+    if os.path.isfile(cv_path):
+        with open(cv_path, "rb") as f:
+            yield f
+        return
+    archive_path, member_path = _split_archive_path(cv_path)
+    with ExitStack() as stack:
+        archive, member = _resolve_member(stack, stack.enter_context(zipfile.ZipFile(archive_path)), member_path)
+        yield _member_stream(archive, member)
+
+
+# The file on disk whose size/mtime change whenever the CV changes
+def cv_stat(cv_path):
+    if os.path.isfile(cv_path):
+        return os.stat(cv_path)
+    return os.stat(_split_archive_path(cv_path)[0])
+
+
+# Same fingerprint iter_cv_sources gives: content hash for files, member CRC for archives
+def cv_content_hash(cv_path):
+    if os.path.isfile(cv_path):
+        return file_content_hash(cv_path)
+    archive_path, member_path = _split_archive_path(cv_path)
+    with ExitStack() as stack:
+        archive, member = _resolve_member(stack, stack.enter_context(zipfile.ZipFile(archive_path)), member_path)
+        info = archive.getinfo(member)
+    return f"crc32:{info.CRC:08x}:{info.file_size}"
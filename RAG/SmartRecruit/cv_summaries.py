@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+
+from token_bucket import TokenBucket
+
+# Bump whenever the summary prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "1"
+SUMMARY_MODEL = "gpt-4-turbo"
+
+
+def summary_messages(context):
+    prompt = f"""
+    You are an AI assistant. Below is the content of a CV:
+    {context}
+    Summarize this CV in a few lines capturing the following:
+    - Highest education
+    - Number of years of experience
+    - Current working company
+    - Key technical skills
+    """
+    return [
+        {"role": "system", "content": "You are a helpful assistant that summarizes CV content."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+class SummaryCache:
+    """
+    Content-addressed summary cache keyed by hash(CV text, prompt version, model).
+    Token usage is kept with each summary so cache hits can report what they saved.
+    """
+
+    def __init__(self, path, model=SUMMARY_MODEL, prompt_version=SUMMARY_PROMPT_VERSION):
+        self.model = model
+        self.prompt_version = prompt_version
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT, tokens INTEGER, created REAL)"
+        )
+        self._conn.commit()
+
+    def key(self, text):
+        payload = f"{self.prompt_version}\0{self.model}\0{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, text):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, tokens FROM summaries WHERE key = ?", (self.key(text),)
+            ).fetchone()
+        return row
+
+    def put(self, text, summary, tokens):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, tokens, created) VALUES (?, ?, ?, ?)",
+                (self.key(text), summary, tokens, time.time()),
+            )
+            self._conn.commit()
+
+
+# Summarize one CV, answering from the cache when the same text was summarized before
+def summarize_cached(client, cache, context):
+    cached = cache.get(context)
+    if cached:
+        return cached[0]
+    response = client.chat.completions.create(
+        model=cache.model, messages=summary_messages(context), temperature=0.2
+    )
+    summary = response.choices[0].message.content
+    cache.put(context, summary, response.usage.total_tokens if response.usage else 0)
+    return summary
+
+
+async def summarize_all(async_client, cache, texts, max_concurrency=8, requests_per_minute=300, progress_callback=None):
+    """
+    Summarize {file_name: text} with at most max_concurrency requests in flight and a
+    token-bucket cap on request rate. Returns the summaries and a throughput report.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    bucket = TokenBucket.per_minute(requests_per_minute, burst=max_concurrency)
+    summaries, failures = {}, {}
+    report = {"total": len(texts), "summarized": 0, "cache_hits": 0, "failed": 0, "tokens_used": 0, "tokens_saved": 0}
+    started = time.monotonic()
+
+    async def summarize_one(file_name, text):
+        cached = cache.get(text)
+        if cached:
+            summaries[file_name] = cached[0]
+            report["cache_hits"] += 1
+            report["tokens_saved"] += cached[1] or 0
+            return
+        async with semaphore:
+            await bucket.acquire_async()
+            try:
+                response = await async_client.chat.completions.create(
+                    model=cache.model, messages=summary_messages(text), temperature=0.2
+                )
+            except Exception as e:
+                failures[file_name] = str(e)
+                report["failed"] += 1
+                return
+        summary = response.choices[0].message.content
+        tokens = response.usage.total_tokens if response.usage else 0
+        cache.put(text, summary, tokens)
+        summaries[file_name] = summary
+        report["summarized"] += 1
+        report["tokens_used"] += tokens
+
+    tasks = [asyncio.ensure_future(summarize_one(name, text)) for name, text in texts.items()]
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        await task
+        if progress_callback:
+            progress_callback(done, len(tasks))
+
+    elapsed = time.monotonic() - started
+    report["seconds"] = round(elapsed, 2)
+    report["cvs_per_second"] = round(len(texts) / elapsed, 2) if elapsed else 0.0
+    report["failures"] = failures
+    return summaries, report
+
+
+# Overnight pre-summarization of every ingested CV: python cv_summaries.py [concurrency] [requests_per_minute]
+if __name__ == "__main__":
+    import json
+    import sys
+
+    import openai
+
+    from SmartRecruit import SUMMARY_CACHE_FILE, api_key, ingested_cv_texts
+
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rpm = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    _, run_report = asyncio.run(
+        summarize_all(openai.AsyncOpenAI(api_key=api_key), SummaryCache(SUMMARY_CACHE_FILE), ingested_cv_texts(), concurrency, rpm)
+    )
+    print(json.dumps(run_report, indent=2))
@@ -0,0 +1,206 @@
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+from cachetools import TTLCache
+from langchain_core.embeddings import Embeddings
+
+import telemetry
+
+# OpenAI errors worth waiting out; anything else fails the batch straight away
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class EmbeddingCache:
+    """
+    On-disk vector cache keyed by hash(chunk text, model, dimensions).
+    Vectors are stored as raw float32 bytes in SQLite.
+    """
+
+    def __init__(self, path, model, dimensions):
+        self.model = model
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB)")
+        self._conn.commit()
+
+    def key(self, text):
+        payload = f"{self.model}\0{self.dimensions}\0{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(part))})", part
+                )
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in items],
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so repeated chunk text is served from the cache,
+    and rate-limited calls are retried with exponential backoff.
+    """
+
+    def __init__(self, embeddings, cache, max_retries=6, base_delay=1.0, query_cache_size=1024, query_ttl=3600):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._lock = threading.Lock()
+        self._query_cache = TTLCache(maxsize=query_cache_size, ttl=query_ttl)
+        self.api_calls = 0
+        self.cache_hits = 0
+        self.query_hits = 0
+        self.query_misses = 0
+
+    def embed_documents(self, texts):
+        with telemetry.span("embedding.embed_documents", texts=len(texts)) as span:
+            keys = [self.cache.key(text) for text in texts]
+            vectors = self.cache.get_many(keys)
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in vectors:
+                    missing.setdefault(key, text)
+            span.set(cache_hits=len(texts) - len(missing), embedded=len(missing),
+                     chars=sum(len(text) for text in missing.values()))
+
+            if missing:
+                new_vectors = self._embed_with_retry(list(missing.values()))
+                fresh = list(zip(missing.keys(), new_vectors))
+                self.cache.put_many(fresh)
+                vectors.update(fresh)
+
+        with self._lock:
+            self.cache_hits += len(texts) - len(missing)
+        return [vectors[key] for key in keys]
+
+    # Queries are cached in memory (LRU with TTL) by their whitespace/case-normalized text,
+    # but the text embedded is the query as typed ("Go" and "go" need not embed alike)
+    def embed_query(self, text):
+        key = " ".join(text.lower().split())
+        with self._lock:
+            vector = self._query_cache.get(key)
+            if vector is not None:
+                self.query_hits += 1
+                return vector
+            self.query_misses += 1
+        with telemetry.span("embedding.embed_query", chars=len(text)):
+            vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._query_cache[key] = vector
+        return vector
+
+    def _embed_with_retry(self, texts):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._lock:
+                    self.api_calls += 1
+                with telemetry.span("openai.embeddings", texts=len(texts), attempt=attempt):
+                    return self.embeddings.embed_documents(texts)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                # Full jitter keeps concurrent batches from retrying in lockstep
+                time.sleep(random.uniform(0, min(60.0, self.base_delay * 2 ** attempt)))
+
+
+class EmbeddingStage:
+    """
+    Collects chunks into batches and runs up to max_concurrency of them at a time through
+    db.add_texts, which embeds each batch with the store's embedding function and writes it
+    straight away. Only the batches in flight are held in memory. embeddings must be that
+    embedding function (a CachedEmbeddings); its counters go into the stats close() returns,
+    along with the error of every batch that failed.
+    """
+
+    def __init__(self, db, embeddings, batch_size=64, max_concurrency=4):
+        self.db = db
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._in_flight = {}
+        self._ids, self._texts, self._metadatas = [], [], []
+        self.failed_ids = set()
+        self.errors = []
+        self.written = 0
+        self._started = time.monotonic()
+        # The embeddings client may be shared, so report only this run's share of its counters
+        self._api_calls_before = embeddings.api_calls
+        self._cache_hits_before = embeddings.cache_hits
+
+    def add(self, chunk_id, text, metadata):
+        self._ids.append(chunk_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        if len(self._ids) >= self.batch_size:
+            self._submit()
+
+    def _submit(self):
+        # Block here rather than queue unbounded work when every slot is busy
+        while len(self._in_flight) >= self.max_concurrency:
+            self._drain(FIRST_COMPLETED)
+        batch = (self._ids, self._texts, self._metadatas)
+        self._ids, self._texts, self._metadatas = [], [], []
+        future = self._pool.submit(telemetry.wrap(self._write), *batch)
+        self._in_flight[future] = batch
+
+    def _write(self, ids, texts, metadatas):
+        with telemetry.span("chroma.add_texts", chunks=len(ids), chars=sum(len(text) for text in texts)):
+            self.db.add_texts(texts, metadatas=metadatas, ids=ids)
+
+    def _drain(self, return_when):
+        done, _ = wait(self._in_flight, return_when=return_when)
+        for future in done:
+            ids, texts, metadatas = self._in_flight.pop(future)
+            error = future.exception()
+            if error is None:
+                self.written += len(ids)
+            else:
+                self.errors.append(f"batch of {len(ids)} chunks: {error}")
+                self.failed_ids.update(ids)
+
+    def close(self):
+        if self._ids:
+            self._submit()
+        if self._in_flight:
+            self._drain(ALL_COMPLETED)
+        self._pool.shutdown()
+        elapsed = time.monotonic() - self._started
+        return {
+            "chunks_written": self.written,
+            "chunks_failed": len(self.failed_ids),
+            "errors": self.errors,
+            "api_calls": self.embeddings.api_calls - self._api_calls_before,
+            "cache_hits": self.embeddings.cache_hits - self._cache_hits_before,
+            "seconds": round(elapsed, 2),
+            "embeddings_per_second": round(self.written / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,49 @@
+from functools import lru_cache
+
+import tiktoken
+
+CHUNK_SEPARATOR = "\n...\n"
+
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="gpt-4-turbo"):
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def build_followup_context(db, file_name, question, full_text, token_budget=1500, k=8,
+                           full_text_tokens=None, model="gpt-4-turbo"):
+    """
+    Return (context, stats) for a follow-up question about one CV. CVs that fit within
+    full_text_tokens (default: the budget) are sent whole; otherwise the CV's chunks most
+    relevant to the question are packed, best first, until the token budget is spent and
+    then put back in document order.
+    """
+    full_text_tokens = token_budget if full_text_tokens is None else full_text_tokens
+    total_tokens = count_tokens(full_text, model)
+    stats = {"mode": "full_text", "cv_tokens": total_tokens, "context_tokens": total_tokens, "chunks": 0}
+    if total_tokens <= full_text_tokens:
+        return full_text, stats
+
+    docs = db.similarity_search(question, k=k, filter={"file_name": file_name})
+    if not docs:
+        return full_text, stats  # Not embedded yet: nothing to retrieve from
+
+    packed, used = [], 0
+    separator_tokens = count_tokens(CHUNK_SEPARATOR, model)
+    for doc in docs:
+        tokens = count_tokens(doc.page_content, model) + (separator_tokens if packed else 0)
+        if used + tokens > token_budget:
+            continue  # A shorter, less relevant chunk may still fit
+        packed.append(doc)
+        used += tokens
+    packed.sort(key=lambda doc: doc.metadata.get("chunk_index", 0))
+
+    stats.update(mode="retrieved", context_tokens=used, chunks=len(packed))
+    return CHUNK_SEPARATOR.join(doc.page_content for doc in packed), stats
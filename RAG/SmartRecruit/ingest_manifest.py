@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+
+# Hash a file's content in fixed-size blocks so large CVs never sit fully in memory
+def file_content_hash(file_path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Fingerprint of everything that changes the vectors produced for a CV
+def settings_fingerprint(**settings):
+    payload = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Deterministic chunk ID so re-running the same ingest overwrites instead of duplicating
+def make_chunk_id(file_name, content_hash, index):
+    return hashlib.sha1(f"{file_name}\0{content_hash}\0{index}".encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Records, per CV file name, the content hash and settings it was embedded with
+    and the IDs of the chunks it produced in the vector store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("files", {})
+
+    def file_names(self):
+        return list(self.entries)
+
+    def get(self, file_name):
+        return self.entries.get(file_name)
+
+    # ID a file's chunk was stored under, or None for a file the manifest does not know
+    def chunk_id_for(self, file_name, index):
+        entry = self.entries.get(file_name)
+        if entry and index < len(entry["chunk_ids"]):
+            return entry["chunk_ids"][index]
+        return None
+
+    # Every chunk ID some file still owns
+    def chunk_ids(self):
+        return {chunk_id for entry in self.entries.values() for chunk_id in entry["chunk_ids"]}
+
+    def is_current(self, file_name, content_hash, settings):
+        entry = self.entries.get(file_name)
+        return (
+            entry is not None
+            and entry["content_hash"] == content_hash
+            and entry["settings"] == settings
+        )
+
+    def record(self, file_name, content_hash, settings, chunk_ids):
+        self.entries[file_name] = {
+            "content_hash": content_hash,
+            "settings": settings,
+            "chunk_ids": list(chunk_ids),
+        }
+
+    # Forget a file and hand back the chunk IDs that must be purged from the store
+    def remove(self, file_name):
+        entry = self.entries.pop(file_name, None)
+        return entry["chunk_ids"] if entry else []
+
+    def save(self):
+        # Write to a temp file first so a crash mid-write never corrupts the manifest
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
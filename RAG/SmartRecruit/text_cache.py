@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+
+from cv_sources import cv_content_hash, cv_stat
+
+
+class ExtractedTextCache:
+    """
+    Persistent cache of extracted CV text. Text is stored once per content hash, and a
+    (path, size, mtime) table lets an unchanged file be found without re-hashing it.
+    Paths may be virtual archive-member paths; size/mtime then come from the archive.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS texts (content_hash TEXT PRIMARY KEY, text TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, content_hash TEXT)"
+        )
+        self._conn.commit()
+
+    def _text_for_hash(self, content_hash):
+        row = self._conn.execute("SELECT text FROM texts WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, file_path):
+        stat = cv_stat(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, content_hash FROM files WHERE path = ?", (file_path,)
+            ).fetchone()
+            if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                return self._text_for_hash(row[2])
+
+        # The file was touched or never seen: the content hash decides
+        content_hash = cv_content_hash(file_path)
+        with self._lock:
+            text = self._text_for_hash(content_hash)
+            if text is not None:
+                self._remember_file(file_path, stat, content_hash)
+                self._conn.commit()
+            return text
+
+    def put(self, file_path, text, content_hash=None):
+        stat = cv_stat(file_path)
+        content_hash = content_hash or cv_content_hash(file_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO texts (content_hash, text) VALUES (?, ?)", (content_hash, text)
+            )
+            self._remember_file(file_path, stat, content_hash)
+            self._conn.commit()
+
+    def _remember_file(self, file_path, stat, content_hash):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (file_path, stat.st_size, stat.st_mtime_ns, content_hash),
+        )
+
+    # Return cached text, parsing the file only on a miss
+    def get_or_extract(self, file_path, extractor):
+        text = self.get(file_path)
+        if text is None:
+            text = extractor(file_path)
+            if not text.startswith("Error reading"):
+                self.put(file_path, text)
+        return text
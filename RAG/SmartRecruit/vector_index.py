@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+from langchain.schema import Document
+
+# Rows are scored in blocks so a float16 matrix is never upcast in one piece
+SCORE_BLOCK_ROWS = 16384
+
+
+class LocalVectorIndex:
+    """
+    In-process vector index. Embeddings live in a memory-mapped .npy matrix (float16 or
+    float32, L2-normalized) with side arrays for chunk ID, file and chunk index, so opening
+    the index maps files instead of loading them. Exact search is a blocked NumPy dot
+    product; approximate=True uses an HNSW graph built alongside the matrix.
+    """
+
+    def __init__(self, folder, embeddings, chunk_store=None, approximate=False):
+        self.embeddings = embeddings
+        self.chunk_store = chunk_store
+        with open(os.path.join(folder, "current"), "r") as f:
+            self.path = os.path.join(folder, f.read().strip())
+        self.vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+        self.chunk_ids = np.load(os.path.join(self.path, "chunk_ids.npy"), mmap_mode="r")
+        self.file_ids = np.load(os.path.join(self.path, "file_ids.npy"), mmap_mode="r")
+        self.chunk_indexes = np.load(os.path.join(self.path, "chunk_indexes.npy"), mmap_mode="r")
+        with open(os.path.join(self.path, "files.json"), "r", encoding="utf-8") as f:
+            self.file_names = json.load(f)
+        self._file_lookup = {name: i for i, name in enumerate(self.file_names)}
+        self.hnsw = None
+        if approximate and os.path.exists(os.path.join(self.path, "hnsw.bin")):
+            import hnswlib
+
+            self.hnsw = hnswlib.Index(space="ip", dim=self.vectors.shape[1])
+            self.hnsw.load_index(os.path.join(self.path, "hnsw.bin"), max_elements=len(self.vectors))
+            self.hnsw.set_ef(128)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    # Cosine similarity of every row against a query vector
+    def score_all(self, query_vector):
+        query = np.array(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = np.empty(len(self.vectors), dtype=np.float32)
+        for start in range(0, len(self.vectors), SCORE_BLOCK_ROWS):
+            block = self.vectors[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        return scores
+
+    def _top_k(self, query_vector, k, filter=None):
+        if len(self.vectors) == 0:
+            return [], []
+        if self.hnsw is not None and not filter:
+            labels, distances = self.hnsw.knn_query(np.asarray(query_vector, dtype=np.float32), k=min(k, len(self)))
+            return labels[0], 1.0 - distances[0]
+
+        scores = self.score_all(query_vector)
+        if filter:
+            file_id = self._file_lookup.get(filter.get("file_name"), -1)
+            rows = np.flatnonzero(np.asarray(self.file_ids) == file_id)
+            order = rows[np.argsort(-scores[rows], kind="stable")[:k]]
+            return order, scores[order]
+        k = min(k, len(scores))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return order, scores[order]
+
+    def _document(self, row):
+        chunk_id = self.chunk_ids[row].decode("ascii")
+        metadata = {"file_name": self.file_names[self.file_ids[row]], "chunk_index": int(self.chunk_indexes[row])}
+        page_content = ""
+        if self.chunk_store is not None:
+            record = self.chunk_store.get(chunk_id)
+            if record:
+                page_content = record["page_content"]
+        return Document(page_content=page_content, metadata=metadata)
+
+    # Same call shapes as langchain's Chroma so main() can use either backend
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        rows, scores = self._top_k(embedding, k, filter)
+        return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k, filter)
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+
+def build_local_index(folder, chunk_store, embedding_cache, dimensions, dtype="float16", with_hnsw=False):
+    """
+    Build a new index version from the chunk store and the cached chunk vectors, then
+    point 'current' at it. Readers with the old version mapped keep working.
+    """
+    os.makedirs(folder, exist_ok=True)
+    version = str(time.time_ns())
+    path = os.path.join(folder, version)
+    os.makedirs(path)
+
+    # Collect rows first so the matrix can be written with its final shape
+    chunk_ids, file_ids, chunk_indexes, keys = [], [], [], []
+    file_lookup = {}
+    for record in chunk_store.iter_chunks():
+        file_name = record["metadata"]["file_name"]
+        chunk_ids.append(record["id"])
+        file_ids.append(file_lookup.setdefault(file_name, len(file_lookup)))
+        chunk_indexes.append(record["metadata"].get("chunk_index", 0))
+        keys.append(embedding_cache.key(record["page_content"]))
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(path, "vectors.npy"), mode="w+", dtype=dtype, shape=(len(keys), dimensions)
+    )
+    present = np.ones(len(keys), dtype=bool)
+    for start in range(0, len(keys), 1000):
+        found = embedding_cache.get_many(keys[start:start + 1000])
+        for offset, key in enumerate(keys[start:start + 1000]):
+            if key in found:
+                vector = np.asarray(found[key], dtype=np.float32)
+                vectors[start + offset] = vector / (np.linalg.norm(vector) or 1.0)
+            else:
+                present[start + offset] = False
+    vectors.flush()
+    del vectors
+
+    if not present.all():
+        # Chunks without a cached vector (e.g. a failed batch) are left out
+        full = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        np.save(os.path.join(path, "vectors.tmp.npy"), full[present])
+        del full
+        os.replace(os.path.join(path, "vectors.tmp.npy"), os.path.join(path, "vectors.npy"))
+
+    np.save(os.path.join(path, "chunk_ids.npy"), np.array(chunk_ids, dtype="S40")[present])
+    np.save(os.path.join(path, "file_ids.npy"), np.array(file_ids, dtype=np.int32)[present])
+    np.save(os.path.join(path, "chunk_indexes.npy"), np.array(chunk_indexes, dtype=np.int32)[present])
+    with open(os.path.join(path, "files.json"), "w", encoding="utf-8") as f:
+        json.dump(list(file_lookup), f, ensure_ascii=False)
+
+    if with_hnsw and present.any():
+        import hnswlib
+
+        matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        hnsw = hnswlib.Index(space="ip", dim=dimensions)
+        hnsw.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            hnsw.add_items(block, np.arange(start, start + len(block)))
+        hnsw.save_index(os.path.join(path, "hnsw.bin"))
+
+    tmp_pointer = os.path.join(folder, "current.tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(folder, "current"))
+
+    # Older versions are no longer reachable; mapped files survive until readers close them
+    for name in os.listdir(folder):
+        if name.isdigit() and name != version:
+            shutil.rmtree(os.path.join(folder, name), ignore_errors=True)
+    return int(present.sum())
+
+
+# Build or rebuild the local index: python vector_index.py [--hnsw]
+if __name__ == "__main__":
+    from chunk_store import ChunkStore
+    from embedding_stage import EmbeddingCache
+
+    from SmartRecruit import (
+        CHUNKS_FOLDER, EMBEDDING_CACHE_FILE, EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, LOCAL_INDEX_DTYPE,
+        LOCAL_INDEX_FOLDER,
+    )
+
+    count = build_local_index(
+        LOCAL_INDEX_FOLDER,
+        ChunkStore(CHUNKS_FOLDER),
+        EmbeddingCache(EMBEDDING_CACHE_FILE, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS),
+        EMBEDDING_DIMENSIONS,
+        dtype=LOCAL_INDEX_DTYPE,
+        with_hnsw="--hnsw" in sys.argv,
+    )
+    print(f"Indexed {count} chunk(s) into {LOCAL_INDEX_FOLDER}")
@@ -0,0 +1,658 @@
+"""
+Local stand-ins for the services the apps call, with configurable latency, streaming
+speed and error injection:
+
+- OpenAI: /v1/chat/completions (plain and streamed) and /v1/embeddings
+- Ollama: /api/chat (streamed NDJSON), /api/generate, /api/tags, /api/ps, with model
+  load times, a limited number of resident models and prompt-prefix caching
+- Alpha Vantage: /query for GLOBAL_QUOTE and TIME_SERIES_DAILY (synthetic random walks)
+- SMTP: plain ESMTP without TLS that accepts and counts every message
+
+Run them on their own to point the apps at them by hand:
+
+    python fake_services.py --latency openai=0.4 --error-rate alphavantage=0.05
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socketserver
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+SERVICES = ("openai", "ollama", "alphavantage", "smtp")
+
+DEFAULT_NUM_CTX = 4096  # Ollama's context window when a request sets no num_ctx
+
+WORDS = (
+    "the candidate has strong experience with python data pipelines cloud services and team "
+    "leadership across several projects delivering measurable results for clients in finance "
+    "retail and healthcare while mentoring engineers and improving release quality"
+).split()
+
+
+class Faults:
+    """Per-request latency (seconds, plus uniform jitter), error rate and streaming speed."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, tokens_per_second=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+
+    def delay(self):
+        pause = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if pause > 0:
+            time.sleep(pause)
+
+    def fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def token_pause(self):
+        if self.tokens_per_second:
+            time.sleep(1.0 / self.tokens_per_second)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def reply_words(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_body(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        self.service.count(urlparse(self.path).path)
+        self.service.handle_get(self)
+
+    def do_POST(self):
+        self.service.count(urlparse(self.path).path)
+        self.service.handle_post(self)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Benchmarks open many connections at once
+
+
+class FakeService:
+    """A threaded server on a free local port; HTTP subclasses implement handle_get/handle_post."""
+
+    name = "http"
+
+    def __init__(self, faults=None, host="127.0.0.1", port=0):
+        self.faults = faults or Faults()
+        self.host = host
+        self.port = port
+        self.requests = Counter()
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = _HTTPServer((self.host, self.port), _Handler)
+        self._server.service = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def count(self, path):
+        with self._lock:
+            self.requests[path] += 1
+
+    def injected_error(self):
+        if self.faults.fail():
+            with self._lock:
+                self.errors += 1
+            return True
+        return False
+
+    def handle_get(self, handler):
+        handler.send_body(404, {"error": "not found"})
+
+    def handle_post(self, handler):
+        handler.send_body(404, {"error": "not found"})
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {"url": self.url, "requests": dict(self.requests), "injected_errors": self.errors}
+
+
+class FakeOpenAI(FakeService):
+    """
+    Chat completions answer with reply_words words, streamed one word per chunk when asked
+    (paced by tokens_per_second). Embeddings are deterministic unit vectors derived from a
+    hash of each input, so identical texts always get identical vectors.
+    """
+
+    name = "openai"
+
+    def __init__(self, faults=None, reply_words=80, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.reply_words = reply_words
+
+    @property
+    def env(self):
+        return {
+            "OPENAI_BASE_URL": self.url + "/v1",
+            "OPENAI_API_BASE": self.url + "/v1",  # Read by langchain's OpenAIEmbeddings
+            "OPENAI_API_KEY": "sk-benchmark",
+        }
+
+    def handle_post(self, handler):
+        path = urlparse(handler.path).path
+        request = handler.read_json()
+        self.faults.delay()
+        if self.injected_error():
+            handler.send_body(429, {"error": {"message": "Rate limit reached (injected)", "type": "rate_limit_error",
+                                              "code": "rate_limit_exceeded"}})
+        elif path.endswith("/chat/completions"):
+            self._chat(handler, request)
+        elif path.endswith("/embeddings"):
+            self._embeddings(handler, request)
+        else:
+            handler.send_body(404, {"error": {"message": f"unknown path {path}"}})
+
+    def _reply(self, messages):
+        last = messages[-1]["content"] if messages else ""
+        if isinstance(last, list):
+            last = " ".join(part.get("text", "") for part in last)
+        # LiveStockIQ's fallback classifier expects its own answer format
+        if "Classify the following user query" in last:
+            return ["Category:", "General", "Query"]
+        return reply_words(self.reply_words, seed=len(last))
+
+    def _chat(self, handler, request):
+        messages = request.get("messages") or []
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        words = self._reply(messages)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        base = {"id": "chatcmpl-benchmark", "created": int(time.time()), "model": request.get("model", "fake")}
+        if not request.get("stream"):
+            handler.send_body(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": " ".join(words)},
+            }]))
+            return
+
+        def event(payload):
+            handler.write_chunk(b"data: " + json.dumps(payload).encode() + b"\n\n")
+
+        handler.start_stream("text/event-stream")
+        chunk = dict(base, object="chat.completion.chunk")
+        for i, word in enumerate(words):
+            if i:
+                self.faults.token_pause()
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            event(dict(chunk, choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+        event(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event(dict(chunk, choices=[], usage=usage))
+        handler.write_chunk(b"data: [DONE]\n\n")
+        handler.end_stream()
+
+    def _embeddings(self, handler, request):
+        inputs = request.get("input")
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = request.get("dimensions") or 1536
+        as_base64 = request.get("encoding_format") == "base64"
+        data, tokens = [], 0
+        for i, item in enumerate(inputs):
+            # langchain may send token ids instead of text
+            text = item if isinstance(item, str) else " ".join(map(str, item))
+            tokens += estimate_tokens(text) if isinstance(item, str) else len(item)
+            seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+            vector /= np.linalg.norm(vector)
+            embedding = base64.b64encode(vector.tobytes()).decode() if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        handler.send_body(200, {"object": "list", "data": data, "model": request.get("model", "fake"),
+                                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+
+class FakeOllama(FakeService):
+    """
+    Models must be loaded before they answer: a request for a model that is not resident
+    waits load_seconds (one load at a time) and may evict the least recently used of
+    max_loaded_models. Each model serves num_parallel requests at once. Prompt processing
+    costs prompt_tokens_per_second for the part of the prompt that differs from the model's
+    previous prompt and reply, like Ollama's prompt cache; prompts longer than num_ctx are
+    cut from the front, which defeats that cache.
+    """
+
+    name = "ollama"
+
+    def __init__(self, faults=None, reply_words=60, load_seconds=0.5, max_loaded_models=2, num_parallel=2,
+                 prompt_tokens_per_second=2000.0, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.reply_words = reply_words
+        self.load_seconds = load_seconds
+        self.max_loaded_models = max_loaded_models
+        self.num_parallel = num_parallel
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.loaded = OrderedDict()  # model -> previous prompt
+        self.loads = Counter()
+        self.truncated = 0
+        self._load_lock = threading.Lock()
+        self._slots = {}
+
+    @property
+    def env(self):
+        return {"OLLAMA_HOST": self.url, "OLLAMA_NUM_PARALLEL": str(self.num_parallel)}
+
+    def _ensure_loaded(self, model):
+        """Return the seconds spent loading (0 when already resident)."""
+        with self._load_lock:
+            if model in self.loaded:
+                self.loaded.move_to_end(model)
+                return 0.0
+            time.sleep(self.load_seconds)
+            self.loaded[model] = ""
+            self.loads[model] += 1
+            while len(self.loaded) > self.max_loaded_models:
+                self.loaded.popitem(last=False)
+            return self.load_seconds
+
+    def _slot(self, model):
+        with self._lock:
+            return self._slots.setdefault(model, threading.Semaphore(self.num_parallel))
+
+    def _remember(self, model, text):
+        with self._load_lock:
+            if model in self.loaded:
+                self.loaded[model] = text
+
+    def _process_prompt(self, model, prompt):
+        """Sleep for the uncached part of the prompt; returns (prompt tokens, seconds)."""
+        with self._load_lock:
+            previous = self.loaded.get(model, "")
+        shared = 0
+        limit = min(len(previous), len(prompt))
+        while shared < limit and previous[shared] == prompt[shared]:
+            shared += 1
+        seconds = estimate_tokens(prompt[shared:]) / self.prompt_tokens_per_second if prompt[shared:] else 0.0
+        time.sleep(seconds)
+        return estimate_tokens(prompt), seconds
+
+    def handle_get(self, handler):
+        path = urlparse(handler.path).path
+        if path == "/api/tags":
+            handler.send_body(200, {"models": [{"name": m, "model": m} for m in self.loads]})
+        elif path == "/api/ps":
+            with self._load_lock:
+                handler.send_body(200, {"models": [{"name": m, "model": m} for m in self.loaded]})
+        else:
+            handler.send_body(404, {"error": "not found"})
+
+    def handle_post(self, handler):
+        path = urlparse(handler.path).path
+        request = handler.read_json()
+        model = request.get("model", "")
+        if path not in ("/api/chat", "/api/generate"):
+            handler.send_body(404, {"error": f"unknown path {path}"})
+            return
+        self.faults.delay()
+        if self.injected_error():
+            handler.send_body(500, {"error": "model runner failed (injected)"})
+            return
+
+        started = time.perf_counter()
+        load_seconds = self._ensure_loaded(model)
+        if path == "/api/generate" and not request.get("prompt"):
+            # An empty generate request only loads the model (how clients preload)
+            handler.send_body(200, {"model": model, "response": "", "done": True, "done_reason": "load",
+                                    "load_duration": int(load_seconds * 1e9)})
+            return
+
+        with self._slot(model):
+            if path == "/api/chat":
+                messages = request.get("messages") or []
+                prompt = "\n".join(f"{m.get('role')}: {m.get('content')}" for m in messages)
+            else:
+                prompt = request.get("prompt", "")
+            # Like Ollama, keep only the end of a prompt that overflows the context window
+            num_ctx = (request.get("options") or {}).get("num_ctx") or DEFAULT_NUM_CTX
+            if estimate_tokens(prompt) > num_ctx:
+                prompt = prompt[-num_ctx * 4:]
+                with self._lock:
+                    self.truncated += 1
+            prompt_tokens, prompt_seconds = self._process_prompt(model, prompt)
+            words = reply_words(self.reply_words, seed=len(prompt))
+            # The reply is in the model's cache too, so the next turn's prompt reuses it
+            self._remember(model, prompt + "\nassistant: " + " ".join(words))
+            final = {
+                "model": model, "done": True, "done_reason": "stop",
+                "load_duration": int(load_seconds * 1e9),
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int(prompt_seconds * 1e9),
+                "eval_count": estimate_tokens(" ".join(words)),
+            }
+
+            def piece(text):
+                if path == "/api/chat":
+                    return {"model": model, "message": {"role": "assistant", "content": text}, "done": False}
+                return {"model": model, "response": text, "done": False}
+
+            if request.get("stream", True) is False:
+                generating = time.perf_counter()
+                for _ in words[1:]:
+                    self.faults.token_pause()
+                final.update(piece(" ".join(words)), done=True, eval_duration=int((time.perf_counter() - generating) * 1e9),
+                             total_duration=int((time.perf_counter() - started) * 1e9))
+                handler.send_body(200, final)
+                return
+
+            handler.start_stream("application/x-ndjson")
+            generating = time.perf_counter()
+            for i, word in enumerate(words):
+                if i:
+                    self.faults.token_pause()
+                handler.write_chunk(json.dumps(piece(word if i == 0 else " " + word)).encode() + b"\n")
+            final.update(piece(""), done=True, eval_duration=max(1, int((time.perf_counter() - generating) * 1e9)),
+                         total_duration=int((time.perf_counter() - started) * 1e9))
+            handler.write_chunk(json.dumps(final).encode() + b"\n")
+            handler.end_stream()
+
+    @property
+    def stats(self):
+        stats = super().stats
+        with self._load_lock:
+            stats.update(model_loads=dict(self.loads), resident=list(self.loaded), truncated_prompts=self.truncated)
+        return stats
+
+
+class FakeAlphaVantage(FakeService):
+    """
+    Quotes and daily series for any symbol, generated as a seeded random walk ending on the
+    latest weekday. Injected errors are the quota notice Alpha Vantage returns with HTTP 200.
+    """
+
+    name = "alphavantage"
+
+    def __init__(self, faults=None, history_days=5000, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.history_days = history_days
+        self._series = {}
+
+    @property
+    def env(self):
+        return {"ALPHA_VANTAGE_BASE_URL": self.url + "/query", "ALPHA_VANTAGE_API_KEY": "benchmark"}
+
+    def _daily(self, symbol):
+        with self._lock:
+            if symbol in self._series:
+                return self._series[symbol]
+        day = date.today()
+        days = []
+        while len(days) < self.history_days:
+            if day.weekday() < 5:
+                days.append(day.isoformat())
+            day -= timedelta(days=1)
+        rng = np.random.default_rng(int.from_bytes(hashlib.blake2b(symbol.encode(), digest_size=8).digest(), "little"))
+        close = 20 + 180 * rng.random() * np.exp(np.cumsum(rng.normal(0, 0.015, len(days))))
+        opens = close * (1 + rng.normal(0, 0.005, len(days)))
+        series = {
+            day: {
+                "1. open": f"{o:.4f}",
+                "2. high": f"{max(o, c) * 1.01:.4f}",
+                "3. low": f"{min(o, c) * 0.99:.4f}",
+                "4. close": f"{c:.4f}",
+                "5. volume": str(int(v)),
+            }
+            for day, o, c, v in zip(days, opens, close, rng.integers(1_000_000, 50_000_000, len(days)))
+        }
+        with self._lock:
+            self._series[symbol] = series
+        return series
+
+    def _periods(self, symbol, period):
+        """Weekly or monthly bars of the full daily history, dated by their last trading day."""
+        groups = {}
+        for day, bar in reversed(list(self._daily(symbol).items())):
+            groups.setdefault(period(date.fromisoformat(day)), []).append((day, bar))
+        series = {}
+        for bars in reversed(list(groups.values())):
+            series[bars[-1][0]] = {
+                "1. open": bars[0][1]["1. open"],
+                "2. high": max(bars, key=lambda item: float(item[1]["2. high"]))[1]["2. high"],
+                "3. low": min(bars, key=lambda item: float(item[1]["3. low"]))[1]["3. low"],
+                "4. close": bars[-1][1]["4. close"],
+                "5. volume": str(sum(int(bar["5. volume"]) for _, bar in bars)),
+            }
+        return series
+
+    def handle_get(self, handler):
+        url = urlparse(handler.path)
+        if url.path != "/query":
+            handler.send_body(404, {"error": "not found"})
+            return
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        function, symbol = params.get("function"), params.get("symbol", "").upper()
+        self.faults.delay()
+        if self.injected_error():
+            handler.send_body(200, {"Note": "Thank you for using Alpha Vantage! Our standard API call frequency "
+                                            "is 5 calls per minute and 500 calls per day. (injected)"})
+        elif function == "GLOBAL_QUOTE":
+            series = self._daily(symbol)
+            (latest, bar), (_, previous) = list(series.items())[:2]
+            change = float(bar["4. close"]) - float(previous["4. close"])
+            handler.send_body(200, {"Global Quote": {
+                "01. symbol": symbol, "02. open": bar["1. open"], "03. high": bar["2. high"],
+                "04. low": bar["3. low"], "05. price": bar["4. close"], "06. volume": bar["5. volume"],
+                "07. latest trading day": latest, "08. previous close": previous["4. close"],
+                "09. change": f"{change:.4f}",
+                "10. change percent": f"{change / float(previous['4. close']) * 100:.4f}%",
+            }})
+        elif function == "TIME_SERIES_DAILY":
+            series = self._daily(symbol)
+            if params.get("outputsize") != "full":
+                series = dict(list(series.items())[:100])
+            handler.send_body(200, {
+                "Meta Data": {"1. Information": "Daily Prices (open, high, low, close) and Volumes",
+                              "2. Symbol": symbol, "3. Last Refreshed": next(iter(series))},
+                "Time Series (Daily)": series,
+            })
+        elif function in ("TIME_SERIES_WEEKLY", "TIME_SERIES_MONTHLY"):
+            weekly = function == "TIME_SERIES_WEEKLY"
+            series = self._periods(symbol, (lambda day: day.isocalendar()[:2]) if weekly else (lambda day: (day.year, day.month)))
+            key = "Weekly Time Series" if weekly else "Monthly Time Series"
+            handler.send_body(200, {"Meta Data": {"2. Symbol": symbol, "3. Last Refreshed": next(iter(series))}, key: series})
+        else:
+            handler.send_body(200, {"Error Message": f"Invalid API call: {function}"})
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        service = self.server.service
+        service.count("session")
+        self.reply("220 localhost fake ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-localhost\r\n250-8BITMIME\r\n250-AUTH PLAIN\r\n250 SIZE 10485760")
+            elif verb == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                service.faults.delay()
+                if service.injected_error():
+                    self.reply("451 4.3.0 Temporary failure (injected)")
+                else:
+                    self.reply("250 OK")
+            elif verb == "RCPT":
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                service.count("message")
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTP(FakeService):
+    """Accepts every message after `latency`; injected errors are a 451 on MAIL FROM."""
+
+    name = "smtp"
+
+    def start(self):
+        self._server = _ThreadingTCPServer((self.host, self.port), _SMTPHandler)
+        self._server.service = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return f"smtp://{self.host}:{self.port}"
+
+    @property
+    def env(self):
+        return {"SMTP_SERVER": self.host, "SMTP_PORT": str(self.port), "SMTP_USER": "bench@example.com",
+                "SMTP_PASSWORD": "benchmark", "SMTP_STARTTLS": "false"}
+
+
+SERVICE_CLASSES = {"openai": FakeOpenAI, "ollama": FakeOllama, "alphavantage": FakeAlphaVantage, "smtp": FakeSMTP}
+
+
+def _per_service(values, cast):
+    """["openai=0.2", "0.05"] -> {"openai": 0.2, "*": 0.05}"""
+    parsed = {}
+    for value in values or []:
+        name, _, number = value.rpartition("=")
+        if name and name not in SERVICES:
+            raise argparse.ArgumentTypeError(f"unknown service {name!r}; expected one of {', '.join(SERVICES)}")
+        parsed[name or "*"] = cast(number)
+    return parsed
+
+
+def add_fault_arguments(parser):
+    group = parser.add_argument_group("fault injection (SERVICE=VALUE, or VALUE for every service)")
+    group.add_argument("--latency", action="append", metavar="[SERVICE=]SECONDS", help="Added to every request")
+    group.add_argument("--jitter", action="append", metavar="[SERVICE=]SECONDS", help="Uniform random extra latency")
+    group.add_argument("--error-rate", action="append", metavar="[SERVICE=]RATE", help="Share of requests that fail")
+    group.add_argument("--tokens-per-second", action="append", metavar="[SERVICE=]N",
+                       help="Streaming speed of openai/ollama replies (default: as fast as possible)")
+
+
+def faults_from_args(args):
+    settings = {
+        "latency": _per_service(args.latency, float),
+        "jitter": _per_service(args.jitter, float),
+        "error_rate": _per_service(args.error_rate, float),
+        "tokens_per_second": _per_service(args.tokens_per_second, float),
+    }
+    return {
+        service: Faults(**{key: values.get(service, values.get("*", getattr(Faults(), key)))
+                           for key, values in settings.items()})
+        for service in SERVICES
+    }
+
+
+def start_services(faults, names=SERVICES, **options):
+    """Start the named services; options are passed as {service: {keyword: value}}."""
+    return {name: SERVICE_CLASSES[name](faults.get(name), **options.get(name, {})).start() for name in names}
+
+
+def service_env(services):
+    env = {}
+    for service in services.values():
+        env.update(service.env)
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake services until interrupted.")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    services = start_services(faults_from_args(args))
+    print("Fake services are running. Point the apps at them with:")
+    for key, value in service_env(services).items():
+        print(f"  export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps({name: service.stats for name, service in services.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Offline benchmarks for SmartRecruit, LiveStockIQ, the bulk mailer and the Ollama chat,
+run against the local fake services in fake_services.py. Results are written as JSON so
+runs can be compared:
+
+    python run_benchmarks.py --output results.json
+    python run_benchmarks.py --scenarios livestockiq chat --latency openai=0.3 --error-rate 0.02
+
+Each scenario runs in its own process with a fresh working directory (kept with --workdir).
+The apps' Python requirements must be installed; no API keys or network access are needed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from fake_services import add_fault_arguments, faults_from_args, service_env, start_services
+from scenarios import SCENARIOS
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_scenario(name, options, workdir, env):
+    folder = os.path.join(workdir, name)
+    os.makedirs(folder, exist_ok=True)
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, os.path.join(BENCHMARKS_FOLDER, "scenarios.py"), name, json.dumps(options)],
+        cwd=folder, env=env, capture_output=True, text=True,
+    )
+    result_path = os.path.join(folder, "result.json")
+    if process.returncode != 0 or not os.path.exists(result_path):
+        return {"error": process.stderr.strip().splitlines()[-20:], "returncode": process.returncode}
+    with open(result_path) as f:
+        result = json.load(f)
+    result["wall_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--workdir", help="Keep scenario working directories here instead of a temp folder")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cvs", type=int, default=200, help="Synthetic CVs to ingest")
+    parser.add_argument("--docx-share", type=float, default=0.3)
+    parser.add_argument("--queries", type=int, default=50, help="CV search queries")
+    parser.add_argument("--follow-ups", type=int, default=10, help="Streamed follow-up answers")
+    parser.add_argument("--stock-requests", type=int, default=200)
+    parser.add_argument("--stock-users", type=int, default=4, help="Concurrent LiveStockIQ users")
+    parser.add_argument("--alpha-vantage-rpm", type=int, default=6000,
+                        help="ALPHA_VANTAGE_REQUESTS_PER_MINUTE for the app (the real free plan allows 5)")
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--email-workers", type=int, default=4)
+    parser.add_argument("--emails-per-minute", type=int, default=60000)
+    parser.add_argument("--chat-turns", type=int, default=200)
+    parser.add_argument("--chat-sessions", type=int, default=1, help="Concurrent chat sessions")
+    parser.add_argument("--chat-models", nargs="+", default=["llama3.2"], help="Assigned to sessions round-robin")
+    parser.add_argument("--chat-switch-every", type=int, default=0,
+                        help="Each session moves to its next model every N turns (0 keeps one model)")
+    parser.add_argument("--chat-scheduler", action="store_true",
+                        help="Send requests through ollama/scheduler.py (preloaded models, per-model queues)")
+    parser.add_argument("--chat-full-history", action="store_true",
+                        help="Send the whole history every turn instead of the conversation memory")
+    parser.add_argument("--ollama-load-seconds", type=float, default=0.5)
+    parser.add_argument("--ollama-max-loaded-models", type=int, default=2)
+    parser.add_argument("--ollama-prompt-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--ollama-num-parallel", type=int, default=2)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    faults = faults_from_args(args)
+    services = start_services(faults, ollama={
+        "load_seconds": args.ollama_load_seconds,
+        "max_loaded_models": args.ollama_max_loaded_models,
+        "prompt_tokens_per_second": args.ollama_prompt_tokens_per_second,
+        "num_parallel": args.ollama_num_parallel,
+    })
+    env = dict(os.environ, **service_env(services))
+    env.update(ALPHA_VANTAGE_REQUESTS_PER_MINUTE=str(args.alpha_vantage_rpm), PYTHONUNBUFFERED="1")
+    options = {key: value for key, value in vars(args).items() if key not in ("scenarios", "output", "workdir")}
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="benchmarks-")
+    results = {}
+    for name in args.scenarios:
+        print(f"Running {name}...", flush=True)
+        results[name] = run_scenario(name, options, workdir, env)
+        if "error" in results[name]:
+            print(f"  {name} failed:\n    " + "\n    ".join(results[name]["error"]), flush=True)
+
+    report = {
+        "meta": {
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": options,
+            "faults": {name: fault.as_dict() for name, fault in faults.items()},
+            "workdir": workdir,
+        },
+        "scenarios": results,
+        "services": {name: service.stats for name, service in services.items()},
+    }
+    for service in services.values():
+        service.stop()
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
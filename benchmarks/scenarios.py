@@ -0,0 +1,290 @@
+"""
+Benchmark scenarios. Each one runs in its own process (started by run_benchmarks.py) with
+the app's folder on sys.path, a scratch working directory and the fake services' URLs in
+the environment, then writes its results to result.json in that directory.
+
+    python scenarios.py <scenario> '<options json>'
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+REPO_FOLDER = os.path.dirname(BENCHMARKS_FOLDER)
+APP_FOLDERS = {
+    "smartrecruit": os.path.join(REPO_FOLDER, "RAG", "SmartRecruit"),
+    "email": os.path.join(REPO_FOLDER, "RAG", "SmartRecruit"),
+    "livestockiq": os.path.join(REPO_FOLDER, "RAG", "LiveStockIQ"),
+    "chat": os.path.join(REPO_FOLDER, "ollama"),
+}
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    values = np.asarray(seconds) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def run_smartrecruit(options):
+    """Ingest a synthetic corpus, then time similarity search, CV ranking and streamed follow-ups."""
+    from synthetic_cvs import QUERIES, write_corpus
+
+    import SmartRecruit as app
+    from cv_extraction import extract_text
+
+    write_corpus(app.WORKING_FOLDER, options["cvs"], options["docx_share"], options["seed"])
+    message, cold_seconds = timed(app.process_and_embed_cvs)
+    chunks = app.ChunkStore(app.CHUNKS_FOLDER)
+    chunk_count = len(chunks)
+    chunks.close()
+    warm_message, warm_seconds = timed(app.process_and_embed_cvs)  # Nothing changed: manifest skips every CV
+
+    rng = random.Random(options["seed"])
+    queries = [rng.choice(QUERIES) + f" #{i}" for i in range(options["queries"])]
+    db = app.get_vector_store()
+    search, search_cached, hits = [], [], []
+    for query in queries:
+        results, elapsed = timed(db.similarity_search, query, k=2)
+        search.append(elapsed)
+        hits.append(results)
+    for query in queries:
+        search_cached.append(timed(db.similarity_search, query, k=2)[1])  # Query vectors now cached
+
+    ranking = []
+    ranker = app.get_ranker()
+    if ranker:
+        embeddings = app.get_embeddings()
+        for query in queries:
+            ranking.append(timed(lambda: ranker.rank(embeddings.embed_query(query), query, bm25_weight=0.3))[1])
+
+    ttft, follow_up = [], []
+    for query, results in list(zip(queries, hits))[:options["follow_ups"]]:
+        if not results:
+            continue
+        file_name = results[0].metadata["file_name"]
+        text = app.get_text_cache().get_or_extract(os.path.join(app.WORKING_FOLDER, file_name), extract_text)
+        stream, stats = app.answer_follow_up("Summarize this candidate's Python experience", file_name, text)
+        for _ in stream:
+            pass
+        if "ttft_s" in stats:
+            ttft.append(stats["ttft_s"])
+        follow_up.append(stats["seconds"])
+
+    return {
+        "ingest": {
+            "cvs": options["cvs"],
+            "chunks": chunk_count,
+            "seconds": round(cold_seconds, 3),
+            "cvs_per_second": round(options["cvs"] / cold_seconds, 2),
+            "chunks_per_second": round(chunk_count / cold_seconds, 2),
+            "unchanged_rerun_seconds": round(warm_seconds, 3),
+            "message": message,
+            "rerun_message": warm_message,
+        },
+        "similarity_search": summarize(search),
+        "similarity_search_cached_query": summarize(search_cached),
+        "rank_all_cvs": summarize(ranking),
+        "follow_up_ttft": summarize(ttft),
+        "follow_up_total": summarize(follow_up),
+    }
+
+
+def run_email(options):
+    """Send one message per synthetic candidate through the bulk mailer."""
+    from bulk_mailer import BulkMailer, SendStatus
+
+    mailer = BulkMailer(
+        os.environ["SMTP_SERVER"], os.environ["SMTP_PORT"], os.environ.get("SMTP_USER"), os.environ.get("SMTP_PASSWORD"),
+        starttls=False, workers=options["email_workers"], messages_per_minute=options["emails_per_minute"],
+        status=SendStatus("email_status.sqlite"),
+    )
+    messages = [(f"candidate{i}@example.com", "Interview invitation", "Hi,\n\nPlease suggest a time.\n")
+                for i in range(options["emails"])]
+    report = mailer.send_all(messages, job_id="benchmark")
+    return dict(report, failed=len(report["failed"]))
+
+
+def answer_stock_query(app, query, full_resolution=False):
+    """What LiveStockIQ does for one submitted query, up to the figure sent to the browser."""
+    import pandas as pd
+    import plotly.express as px
+
+    analysis = app.query_analyzer_with_mapping(query)
+    category, interval, symbol = analysis.get("category"), analysis.get("interval"), analysis.get("symbol")
+    symbols = analysis.get("symbols") or ([symbol] if symbol else [])
+    payload = 0
+    if category == "Stock Price" and len(symbols) > 1:
+        rows = app.fetch_concurrently(app.retrieve_quote_row, symbols)
+        payload = len(pd.DataFrame(rows).to_json())
+    elif category == "Stock Price" and symbol:
+        price, _ = app.retrieve_stock_price(symbol)
+        payload = len(str(price))
+    elif category == "Stock Chart" and symbols and interval:
+        charts = app.fetch_concurrently(lambda s: app.retrieve_stock_chart(s, interval), symbols)
+        for sym, (df, _) in zip(symbols, charts):
+            if df is not None:
+                df = df if full_resolution else app.downsample_frame(df, "Close", app.CHART_MAX_POINTS)
+                payload += len(px.line(df, x=df.index, y="Close", render_mode="webgl").to_json())
+    elif category == "General Query":
+        payload = len("".join(app.generator_stream(query, {})))
+    return category or "Unresolved", analysis["route"], payload
+
+
+def run_livestockiq(options):
+    """End-to-end latency of the labelled router corpus, replayed by concurrent users."""
+    import LiveStockIQ as app
+
+    with open(os.path.join(APP_FOLDERS["livestockiq"], "query_corpus.jsonl")) as f:
+        corpus = [json.loads(line)["query"] for line in f if line.strip()]
+    rng = random.Random(options["seed"])
+    queries = [rng.choice(corpus) for _ in range(options["stock_requests"])]
+
+    latencies, by_category, routes, payload = [], {}, {}, []
+    errors = 0
+    lock = threading.Lock()
+
+    def run(query):
+        nonlocal errors
+        try:
+            (category, route, size), elapsed = timed(answer_stock_query, app, query)
+        except Exception as e:
+            with lock:
+                errors += 1
+            print(f"{query!r} failed: {e}", file=sys.stderr)
+            return
+        with lock:
+            latencies.append(elapsed)
+            by_category.setdefault(category, []).append(elapsed)
+            routes[route] = routes.get(route, 0) + 1
+            payload.append(size)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options["stock_users"]) as pool:
+        list(pool.map(run, queries))
+    seconds = time.perf_counter() - started
+
+    return {
+        "requests": len(queries),
+        "users": options["stock_users"],
+        "errors": errors,
+        "requests_per_second": round(len(queries) / seconds, 2),
+        "end_to_end": summarize(latencies),
+        "by_category": {category: summarize(values) for category, values in sorted(by_category.items())},
+        "routes": routes,
+        "mean_payload_bytes": round(float(np.mean(payload)), 1) if payload else 0,
+        "market_data": app.get_market_data().stats,
+        "router": app.get_query_router().stats,
+    }
+
+
+def chat_session(models, turns, rng, full_history=False, scheduler=None, switch_every=0, session=None):
+    from conversation_memory import ConversationMemory
+    from streaming import stream_chat
+
+    memory = ConversationMemory(client=scheduler)
+    history = []
+    latencies, ttft, prompt_tokens = [], [], []
+    for turn in range(turns):
+        # Like switching the model dropdown every switch_every turns
+        model = models[turn // switch_every % len(models)] if switch_every else models[0]
+        user_input = f"Turn {turn}: " + " ".join(rng.choice(["tell", "me", "more", "about", "python", "testing",
+                                                              "deployment", "and", "monitoring"]) for _ in range(40))
+        if full_history:
+            messages, options = history + [{"role": "user", "content": user_input}], {}
+        else:
+            messages, options = memory.messages(model, user_input), memory.chat_options(model)
+        stats = {}
+        started = time.perf_counter()
+        if scheduler is not None:
+            reply = "".join(scheduler.stream_chat(model, messages, stats, session=session, **options))
+        else:
+            reply = "".join(stream_chat(model, messages, stats, **options))
+        latencies.append(time.perf_counter() - started)
+        ttft.append(stats.get("ttft_s", 0.0))
+        prompt_tokens.append(stats.get("prompt_tokens") or 0)
+        if full_history:
+            history += [{"role": "user", "content": user_input}, {"role": "assistant", "content": reply}]
+        else:
+            memory.add_turn(model, user_input, reply, stats)
+    return latencies, ttft, prompt_tokens
+
+
+def run_chat(options):
+    """Multi-turn chat sessions against Ollama; later turns should cost the same as early ones."""
+    models = options["chat_models"]
+    sessions = options["chat_sessions"]
+    scheduler = None
+    if options["chat_scheduler"]:
+        from scheduler import OllamaScheduler
+
+        scheduler = OllamaScheduler(models)
+        for model in models:
+            scheduler.preload(model)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(
+            lambda i: chat_session(models[i % len(models):] + models[:i % len(models)], options["chat_turns"],
+                                   random.Random(options["seed"] + i), options["chat_full_history"],
+                                   scheduler, options["chat_switch_every"], f"session-{i}"),
+            range(sessions),
+        ))
+    seconds = time.perf_counter() - started
+
+    latencies = [value for session, _, _ in results for value in session]
+    quarter = max(1, options["chat_turns"] // 4)
+    first = [value for session, _, _ in results for value in session[:quarter]]
+    last = [value for session, _, _ in results for value in session[-quarter:]]
+    return {
+        "sessions": sessions,
+        "turns_per_session": options["chat_turns"],
+        "models": models,
+        "history": "full" if options["chat_full_history"] else "memory",
+        "scheduler": scheduler.stats if scheduler is not None else None,
+        "seconds": round(seconds, 3),
+        "turn_latency": summarize(latencies),
+        "ttft": summarize([value for _, session, _ in results for value in session]),
+        "first_quarter_mean_ms": round(float(np.mean(first)) * 1000, 3),
+        "last_quarter_mean_ms": round(float(np.mean(last)) * 1000, 3),
+        "last_turn_prompt_tokens": [session[-1] for _, _, session in results],
+    }
+
+
+SCENARIOS = {
+    "smartrecruit": run_smartrecruit,
+    "email": run_email,
+    "livestockiq": run_livestockiq,
+    "chat": run_chat,
+}
+
+
+def main():
+    name, options = sys.argv[1], json.loads(sys.argv[2])
+    sys.path[:0] = [APP_FOLDERS[name], BENCHMARKS_FOLDER]
+    result = SCENARIOS[name](options)
+    with open("result.json", "w") as f:
+        json.dump(result, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Generate a corpus of synthetic CVs as .pdf and .docx files for ingest benchmarks.
+
+The files are written directly (a minimal PDF with a text layer and a minimal Word
+document), so generating thousands of them needs no extra libraries and takes seconds.
+
+    python synthetic_cvs.py working_cvs 500 --docx-share 0.3
+"""
+import argparse
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+FIRST_NAMES = ["Aarav", "Maya", "Liam", "Sofia", "Noah", "Zara", "Ethan", "Priya", "Lucas", "Amara", "Omar", "Elena"]
+LAST_NAMES = ["Sharma", "Okafor", "Nguyen", "Garcia", "Smith", "Kowalski", "Haddad", "Tanaka", "Silva", "Brown"]
+ROLES = ["Data Scientist", "Backend Engineer", "ML Engineer", "Data Engineer", "DevOps Engineer",
+         "Frontend Developer", "Product Analyst", "QA Engineer"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Analytics", "Hooli", "Stark Industries", "Wayne Tech"]
+SKILLS = ["Python", "SQL", "Java", "Go", "Kubernetes", "Docker", "AWS", "Azure", "PyTorch", "TensorFlow",
+          "Spark", "Airflow", "React", "TypeScript", "PostgreSQL", "MongoDB", "Terraform", "NLP", "LLMs", "Tableau"]
+DUTIES = [
+    "built and maintained {skill} services handling millions of requests per day",
+    "led a team of {n} engineers delivering a {skill} platform migration",
+    "designed data pipelines in {skill} that cut reporting time by {n}0 percent",
+    "introduced automated testing and CI for {skill} projects",
+    "worked with stakeholders to ship {skill} features for enterprise clients",
+    "mentored junior developers and ran {skill} workshops",
+]
+
+# Sample queries for the CV search benchmarks
+QUERIES = [f"Show me all CVs with experience in {skill}" for skill in SKILLS] + [
+    f"Candidates who worked as {role}" for role in ROLES
+]
+
+
+def cv_lines(rng, number):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    skills = rng.sample(SKILLS, 6)
+    lines = [
+        f"{first} {last}",
+        f"Email: {first.lower()}.{last.lower()}{number}@example.com  Phone: +1 555 {rng.randint(1000000, 9999999)}",
+        "",
+        "Summary",
+        f"{rng.choice(ROLES)} with {rng.randint(2, 15)} years of experience in {', '.join(skills[:3])}.",
+        "",
+        "Experience",
+    ]
+    for _ in range(rng.randint(2, 5)):
+        lines.append(f"{rng.choice(ROLES)} at {rng.choice(COMPANIES)} ({rng.randint(2008, 2020)} - {rng.randint(2021, 2025)})")
+        for _ in range(rng.randint(3, 6)):
+            lines.append("- " + rng.choice(DUTIES).format(skill=rng.choice(skills), n=rng.randint(2, 9)))
+    lines += ["", "Skills", ", ".join(skills), "", "Education",
+              f"B.Sc. Computer Science, University of {rng.choice(['Leeds', 'Toronto', 'Delhi', 'Lagos', 'Austin'])}"]
+    return lines
+
+
+def _pdf_text(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace")
+
+
+def write_pdf(path, lines, lines_per_page=50):
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in pages:
+        stream = b"BT /F1 10 Tf 50 800 Td 13 TL " + b" ".join(b"(%s) '" % _pdf_text(line) for line in page) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+
+def write_docx(path, lines):
+    body = "".join(f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>' for line in lines)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        docx.writestr("_rels/.rels", DOCX_RELS)
+        docx.writestr("word/document.xml", document)
+
+
+def write_corpus(folder, count, docx_share=0.3, seed=0):
+    """Write `count` CVs into folder and return their file names."""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    names = []
+    for number in range(count):
+        lines = cv_lines(rng, number)
+        if rng.random() < docx_share:
+            name = f"cv_{number:05d}.docx"
+            write_docx(os.path.join(folder, name), lines)
+        else:
+            name = f"cv_{number:05d}.pdf"
+            write_pdf(os.path.join(folder, name), lines)
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--docx-share", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    names = write_corpus(args.folder, args.count, args.docx_share, args.seed)
+    print(f"Wrote {len(names)} CVs to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
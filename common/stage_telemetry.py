@@ -0,0 +1,187 @@
+"""
+Opt-in tracing and stage-latency metrics (OpenTelemetry), shared by every app in the
+repository; each app's requirements install this folder (pip install -e common). The apps'
+telemetry.py calls setup() with the app's name and re-exports span, record_span and wrap.
+
+Set TELEMETRY_EXPORTER to turn it on:
+    console  spans and metrics printed to stdout
+    file     spans and metrics appended as JSON lines to TELEMETRY_FILE (default telemetry.jsonl)
+    otlp     sent to an OpenTelemetry collector (OTEL_EXPORTER_OTLP_ENDPOINT, default localhost:4317)
+
+When it is unset, span() hands back one shared no-op object and OpenTelemetry is never
+imported, so instrumented code pays only a function call.
+
+Find the slowest stage of each request in a file export with (from any app folder):
+    python telemetry.py telemetry.jsonl
+"""
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+EXPORTER = os.getenv("TELEMETRY_EXPORTER", "").lower()
+TELEMETRY_FILE = os.getenv("TELEMETRY_FILE", "telemetry.jsonl")
+EXPORT_INTERVAL_MS = int(os.getenv("TELEMETRY_EXPORT_INTERVAL_MS", "10000"))
+
+
+class _NoSpan:
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    """The current OpenTelemetry span; set() skips None values, which OpenTelemetry rejects."""
+
+    def __init__(self, span):
+        self.span = span
+
+    def set(self, **attributes):
+        self.span.set_attributes({key: value for key, value in attributes.items() if value is not None})
+
+
+_tracer, _duration, _context = None, None, None
+
+
+def setup(service_name):
+    """
+    Start exporting if TELEMETRY_EXPORTER asks for it. service_name (the app) is used unless
+    OTEL_SERVICE_NAME is set; only the first call in a process has an effect.
+    """
+    global _tracer, _duration, _context
+    if _tracer is not None or EXPORTER in ("", "none", "off", "false"):
+        return
+    service_name = os.getenv("OTEL_SERVICE_NAME", service_name)
+    from opentelemetry import context, metrics, trace
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        span_exporter, metric_exporter = OTLPSpanExporter(), OTLPMetricExporter()
+    else:
+        out = open(TELEMETRY_FILE, "a", buffering=1) if EXPORTER == "file" else sys.stdout
+        span_exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + os.linesep)
+        metric_exporter = ConsoleMetricExporter(out=out, formatter=lambda data: data.to_json(indent=None) + os.linesep)
+
+    resource = Resource.create({"service.name": service_name})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(tracer_provider)
+    reader = PeriodicExportingMetricReader(metric_exporter, export_interval_millis=EXPORT_INTERVAL_MS)
+    metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[reader]))
+
+    _duration = metrics.get_meter(service_name).create_histogram(
+        "stage.duration", unit="ms", description="Time spent in each instrumented stage"
+    )
+    _context = context
+    _tracer = trace.get_tracer(service_name)
+
+
+def span(name, **attributes):
+    """
+    Context manager timing one stage as a child of the current span. The object it yields
+    has set(**attributes) for results known only at the end (tokens, cache hits, sizes).
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _traced(name, attributes)
+
+
+@contextmanager
+def _traced(name, attributes):
+    started = time.perf_counter()
+    with _tracer.start_as_current_span(name) as current:
+        wrapped = _Span(current)
+        wrapped.set(**attributes)
+        try:
+            yield wrapped
+        finally:
+            _duration.record((time.perf_counter() - started) * 1000, {"stage": name})
+
+
+def record_span(name, start_ns, **attributes):
+    """
+    Record a stage that has already finished, started at start_ns (time.time_ns()). For
+    work that cannot sit inside a with block, such as a generator streaming a reply.
+    """
+    if _tracer is None:
+        return
+    current = _tracer.start_span(name, start_time=start_ns)
+    _Span(current).set(**attributes)
+    current.end()
+    _duration.record((time.time_ns() - start_ns) / 1e6, {"stage": name})
+
+
+def wrap(function):
+    """Carry the current span into a function run on another thread (thread pools lose it)."""
+    if _tracer is None:
+        return function
+    parent = _context.get_current()
+
+    def run(*args, **kwargs):
+        token = _context.attach(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _context.detach(token)
+
+    return run
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def slowest_stages(path):
+    """Per trace in a file export: the root span, its duration and its slowest child stages."""
+    traces = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if "context" in record and "start_time" in record:  # Metric lines are skipped
+                traces[record["context"]["trace_id"]].append(record)
+
+    report = []
+    for spans in traces.values():
+        root = next((s for s in spans if not s.get("parent_id")), None)
+        if root is None:
+            continue
+        children = [s for s in spans if s.get("parent_id") == root["context"]["span_id"]]
+        stages = sorted(
+            ((s["name"], (_timestamp(s["end_time"]) - _timestamp(s["start_time"])) * 1000) for s in children),
+            key=lambda item: -item[1],
+        )
+        report.append({
+            "request": root["name"],
+            "started": root["start_time"],
+            "ms": round((_timestamp(root["end_time"]) - _timestamp(root["start_time"])) * 1000, 1),
+            "slowest": [(stage, round(ms, 1)) for stage, ms in stages[:3]],
+        })
+    return sorted(report, key=lambda item: item["started"])
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else TELEMETRY_FILE
+    for item in slowest_stages(path):
+        stages = ", ".join(f"{stage} {ms} ms" for stage, ms in item["slowest"]) or "no child stages"
+        print(f"{item['started']}  {item['request']:<28} {item['ms']:>9} ms  <- {stages}")
+
+
+if __name__ == "__main__":
+    main()
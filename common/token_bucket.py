@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` tokens per second refill a bucket of size `capacity`.
+    Callers wait for a token instead of being rejected, so bursts are queued, not dropped.
+    Usable from threads (acquire) and from asyncio (acquire_async); both accept a timeout
+    and return False instead of waiting longer than that.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, count, burst=None):
+        return cls(count / 60.0, burst)
+
+    # Take tokens if available, otherwise return how long to wait before trying again
+    def _take(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Wait for tokens; returns False if that would take longer than timeout seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self._take(tokens)
+            if delay == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """acquire() for asyncio: sleeps without blocking the event loop."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self._take(tokens)
+            if delay == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
@@ -1,39 +1,66 @@
+import uuid
+
 import streamlit as st
-import ollama
+from conversation_memory import ConversationMemory, describe_memory
+from scheduler import OllamaScheduler, describe_scheduler
+from streaming import describe_stats
+import telemetry
+
+available_models = ["llama3.2", "gpt-oss:20b","mistral", "gemma"]  # Adjust based on your Ollama models
 
-def chat_with_ollama(model_name, user_input, conversation_history):
+@st.cache_resource
+def get_scheduler():
+    """One scheduler per server process: a pooled client, per-model queues and warm models for every session."""
+    return OllamaScheduler(available_models).start()
+
+def chat_with_ollama(model_name, user_input, conversation_history, memory, stats, scheduler, session_id):
     """
-    Function to interact with an Ollama model, appending user input and getting AI response.
+    Function to interact with an Ollama model, streaming the AI response as it is generated.
+    Only the memory's summary and recent turns are sent, not the whole conversation.
+    The user input and the full response are added to the conversation history only once
+    the response completes, so an abandoned answer leaves the history unchanged.
     """
-    # Add user message to conversation history
-    conversation_history.append({"role": "user", "content": user_input})
+    messages = memory.messages(model_name, user_input)
+    pieces = []
 
+    # Call Ollama's chat API, waiting for the model's turn in the shared queue
+    stream = scheduler.stream_chat(model_name, messages, stats, session=session_id, **memory.chat_options(model_name))
     try:
-        # Call Ollama's chat API
-        response = ollama.chat(
-            model=model_name,
-            messages=conversation_history
-        )
-        ai_response = response["message"]["content"]
-
-        # Add AI response to conversation history
-        conversation_history.append({"role": "assistant", "content": ai_response})
-        return ai_response, conversation_history
+        for piece in stream:
+            pieces.append(piece)
+            yield piece
     except Exception as e:
-        return f"Error: {e}", conversation_history
+        yield f"Error: {e}"
+        return
+    finally:
+        stream.close()  # Also reached when the page is left mid-answer
+
+    # Add user message and AI response to conversation history and memory
+    reply = "".join(pieces)
+    conversation_history.append({"role": "user", "content": user_input})
+    conversation_history.append({"role": "assistant", "content": reply})
+    memory.add_turn(model_name, user_input, reply, stats)
 
 # Streamlit app setup
 st.title("Ollama Chat App")
 st.write("Interact with a local Ollama model. Select a model and start chatting!")
 
+scheduler = get_scheduler()
+
 # Initialize session state for conversation history and model selection
+# (the history is only displayed; the memory decides what is sent to the model)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory(client=scheduler)
 if "model_name" not in st.session_state:
     st.session_state.model_name = "llama3.2"
+if "response_stats" not in st.session_state:
+    st.session_state.response_stats = {}
 
 # Model selection dropdown
-available_models = ["llama3.2", "gpt-oss:20b","mistral", "gemma"]  # Adjust based on your Ollama models
 st.session_state.model_name = st.selectbox(
     "Select Model", available_models, index=available_models.index(st.session_state.model_name)
 )
@@ -44,10 +71,16 @@ user_input = st.text_input("Your Message:", placeholder="Type your message here.
 # Send button
 if st.button("Send"):
     if user_input.strip():
-        # Get AI response and update conversation history
-        ai_response, st.session_state.conversation_history = chat_with_ollama(
-            st.session_state.model_name, user_input, st.session_state.conversation_history
-        )
+        # Stream the AI response as it arrives; the conversation history is updated when it completes
+        st.markdown(f"**You**: {user_input}")
+        st.session_state.response_stats = {}
+        with telemetry.span("chat.turn", model=st.session_state.model_name) as span:
+            st.write_stream(chat_with_ollama(
+                st.session_state.model_name, user_input, st.session_state.conversation_history,
+                st.session_state.memory, st.session_state.response_stats,
+                scheduler, st.session_state.session_id,
+            ))
+            span.set(**st.session_state.memory.stats)
         # Force a rerun to update the UI
         st.rerun()
     else:
@@ -60,8 +93,14 @@ for message in st.session_state.conversation_history:
         st.markdown(f"**You**: {message['content']}")
     else:
         st.markdown(f"**AI**: {message['content']}")
+if describe_stats(st.session_state.response_stats):
+    st.caption(describe_stats(st.session_state.response_stats))
+if st.session_state.conversation_history:
+    st.caption(describe_memory(st.session_state.memory))
+st.caption(describe_scheduler(scheduler, st.session_state.model_name))
 
 # Clear conversation button
 if st.button("Clear Conversation"):
     st.session_state.conversation_history = []
+    st.session_state.memory.clear()
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,166 @@
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import ollama
+
+import telemetry
+
+# Context window requested from Ollama (num_ctx) per model; other models get DEFAULT_CONTEXT_TOKENS.
+# Keeping it fixed per model means the model is loaded once and never reloaded for a new size.
+MODEL_CONTEXT_TOKENS = {"llama3.2": 8192, "gpt-oss:20b": 8192, "mistral": 8192, "gemma": 8192}
+DEFAULT_CONTEXT_TOKENS = 4096
+
+RESPONSE_TOKENS = 1024  # Room left for the reply
+SUMMARY_TOKENS = 256  # Longest rolling summary (num_predict of the summary call)
+MESSAGE_OVERHEAD = 4  # Role and template tokens around each message
+CHARS_PER_TOKEN = 4.0  # Starting estimate, refined per model from the server's eval_count
+LOW_WATER = 0.5  # Eviction trims the window down to this share of its budget
+
+# Keeps the model and its prompt cache loaded between turns
+KEEP_ALIVE = "30m"
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an assistant.
+Keep names, facts, decisions and open questions; drop small talk. Answer with the summary only.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+# One background summarizer per process, shared by every session
+_summarizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ollama-summary")
+
+
+class ConversationMemory:
+    """
+    What is sent to the model each turn: a rolling summary of older turns plus a sliding
+    window of recent turns that fits the model's token budget.
+
+    Tokens are counted once per message when it is added, so building a prompt costs the
+    same on turn 200 as on turn 2. When the window overflows, whole turns are evicted down
+    to LOW_WATER of the budget in one go: the prompt prefix then stays byte-identical for
+    many turns, so Ollama's prompt cache (kept loaded by keep_alive) only processes the new
+    messages. Evicted turns are folded into the summary in the background; until that
+    finishes the previous summary is used.
+    """
+
+    def __init__(self, client=None, context_tokens=None, response_tokens=RESPONSE_TOKENS,
+                 summary_tokens=SUMMARY_TOKENS, keep_alive=KEEP_ALIVE, executor=None):
+        self.client = client or ollama
+        self.context_tokens = dict(MODEL_CONTEXT_TOKENS, **(context_tokens or {}))
+        self.response_tokens = response_tokens
+        self.summary_tokens = summary_tokens
+        self.keep_alive = keep_alive
+        self.executor = executor or _summarizer
+        self._chars_per_token = {}
+        self.clear()
+
+    def clear(self):
+        self._turns = deque()  # (messages, tokens) per user/assistant turn
+        self._window_tokens = 0
+        self.summary = ""
+        self._summary_message = None
+        self._unsummarized = []
+        self._pending = None
+        self.evicted_turns = 0
+
+    def count_tokens(self, model, text):
+        return math.ceil(len(text) / self._chars_per_token.get(model, CHARS_PER_TOKEN)) + MESSAGE_OVERHEAD
+
+    def observe(self, model, text, tokens):
+        """Refine the model's characters-per-token estimate from a server-reported token count."""
+        if tokens and len(text) > 100:
+            ratio = len(text) / tokens
+            previous = self._chars_per_token.get(model, CHARS_PER_TOKEN)
+            self._chars_per_token[model] = 0.8 * previous + 0.2 * ratio
+
+    def window_budget(self, model):
+        context = self.context_tokens.get(model, DEFAULT_CONTEXT_TOKENS)
+        return context - self.response_tokens - self.summary_tokens - MESSAGE_OVERHEAD
+
+    def chat_options(self, model):
+        """Keyword arguments for ollama.chat that keep the model, its context size and prompt cache stable."""
+        return {
+            "options": {"num_ctx": self.context_tokens.get(model, DEFAULT_CONTEXT_TOKENS)},
+            "keep_alive": self.keep_alive,
+        }
+
+    def messages(self, model, user_input):
+        """The messages to send for a new user message: summary, recent turns, then the user message."""
+        self._collect_summary(model)
+        budget = self.window_budget(model) - self.count_tokens(model, user_input)
+        if self._window_tokens > budget:
+            self._evict(model, int(budget * LOW_WATER))
+        messages = [self._summary_message] if self._summary_message else []
+        for turn, _ in self._turns:
+            messages.extend(turn)
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def add_turn(self, model, user_input, reply, stats=None):
+        """Record a completed turn; stats from streaming.stream_chat refine the token estimate."""
+        if stats:
+            self.observe(model, reply, stats.get("completion_tokens"))
+        turn = [{"role": "user", "content": user_input}, {"role": "assistant", "content": reply}]
+        tokens = sum(self.count_tokens(model, message["content"]) for message in turn)
+        self._turns.append((turn, tokens))
+        self._window_tokens += tokens
+
+    def _evict(self, model, target):
+        while self._turns and self._window_tokens > target:
+            turn, tokens = self._turns.popleft()
+            self._window_tokens -= tokens
+            self._unsummarized.extend(turn)
+            self.evicted_turns += 1
+        self._submit_summary(model)
+
+    def _submit_summary(self, model):
+        if self._pending is not None or not self._unsummarized:
+            return
+        evicted, self._unsummarized = self._unsummarized, []
+        self._pending = self.executor.submit(telemetry.wrap(self._summarize), model, self.summary, evicted)
+
+    def _collect_summary(self, model):
+        if self._pending is None or not self._pending.done():
+            return
+        try:
+            self.summary = self._pending.result()
+            self._summary_message = {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.summary}",
+            }
+        except Exception as e:
+            print(f"Summary failed, keeping the previous one: {e}")
+        self._pending = None
+        self._submit_summary(model)  # Turns evicted while the last summary was running
+
+    def _summarize(self, model, summary, evicted):
+        text = "\n".join(f"{message['role']}: {message['content']}" for message in evicted)
+        with telemetry.span("ollama.summary", model=model, messages=len(evicted), chars=len(text)) as span:
+            response = self.client.chat(
+                model=model,
+                messages=[{"role": "user", "content": SUMMARY_PROMPT.format(summary=summary or "(none)", messages=text)}],
+                options={"num_predict": self.summary_tokens, "num_ctx": self.context_tokens.get(model, DEFAULT_CONTEXT_TOKENS)},
+                keep_alive=self.keep_alive,
+            )
+            span.set(prompt_tokens=response.get("prompt_eval_count"), completion_tokens=response.get("eval_count"))
+            return response["message"]["content"].strip()
+
+    @property
+    def stats(self):
+        return {
+            "window_turns": len(self._turns),
+            "window_tokens": self._window_tokens,
+            "evicted_turns": self.evicted_turns,
+            "summarizing": self._pending is not None,
+        }
+
+
+def describe_memory(memory):
+    stats = memory.stats
+    text = f"Context: {stats['window_turns']} recent turns (~{stats['window_tokens']} tokens)"
+    if stats["evicted_turns"]:
+        text += f", {stats['evicted_turns']} older turns " + ("being summarized" if stats["summarizing"] else "summarized")
+    return text
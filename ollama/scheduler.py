@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import ollama
+
+import telemetry
+from conversation_memory import DEFAULT_CONTEXT_TOKENS, KEEP_ALIVE, MODEL_CONTEXT_TOKENS
+from streaming import stream_chat
+
+# Requests run at once per model; match the server's OLLAMA_NUM_PARALLEL
+MAX_CONCURRENCY = int(os.getenv("OLLAMA_NUM_PARALLEL", "2"))
+# Requests allowed to wait per model before new ones are turned away
+MAX_WAITING = int(os.getenv("OLLAMA_MAX_WAITING", "64"))
+# Models the server keeps loaded at once; match the server's OLLAMA_MAX_LOADED_MODELS. Warming
+# more than that only makes the server evict a model someone is using
+MAX_LOADED_MODELS = int(os.getenv("OLLAMA_MAX_LOADED_MODELS", "3"))
+# Warm models idle for this long are pinged again so keep_alive never runs out
+REFRESH_SECONDS = 300
+# A request whose load_duration exceeds this found its model unloaded
+COLD_LOAD_SECONDS = 0.1
+
+BACKGROUND = "background"  # Session of requests made without one, e.g. conversation summaries
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class _Waiter:
+    def __init__(self):
+        self.granted = threading.Event()
+        self.enqueued = time.perf_counter()
+
+
+class _ModelQueue:
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.sessions = OrderedDict()  # session -> deque of waiters, in round-robin order
+        self.waiting = 0
+        self.served = 0
+        self.waits = deque(maxlen=500)  # Seconds waited by recent requests
+
+
+class OllamaScheduler:
+    """
+    One per process, shared by every chat session. Requests go through a single pooled
+    ollama.Client and a bounded queue per model: at most max_concurrency run at once per
+    model, and waiting requests are served round-robin by session, so one session sending
+    many requests (or a burst of background summaries) cannot starve the others.
+
+    Up to max_loaded of the models, the most recently requested first, are loaded at start
+    and pinged again before keep_alive expires, always with the num_ctx the chat uses, so
+    switching between them mid-conversation never waits for a load. Preloads queue for a
+    slot like any request. Cold loads that still happen (e.g. the server evicted a model)
+    are kept in load_events.
+    """
+
+    def __init__(self, models, host=None, client=None, max_concurrency=MAX_CONCURRENCY,
+                 max_waiting=MAX_WAITING, keep_alive=KEEP_ALIVE, refresh_seconds=REFRESH_SECONDS,
+                 max_loaded=MAX_LOADED_MODELS):
+        self.models = list(models)
+        self.client = client or ollama.Client(host=host)
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.keep_alive = keep_alive
+        self.refresh_seconds = refresh_seconds
+        self.max_loaded = max_loaded
+        self.load_events = deque(maxlen=50)
+        self._queues = {}
+        self._last_used = {}  # Last request or preload, per model
+        self._last_requested = {}  # Last request only: decides which models stay warm
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._warmer = None
+
+    def start(self):
+        """Load the models in the background and keep them warm; returns self."""
+        if self._warmer is None:
+            self._warmer = threading.Thread(target=self._keep_warm, name="ollama-warmer", daemon=True)
+            self._warmer.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def options(self, model):
+        return {"num_ctx": MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)}
+
+    def preload(self, model):
+        """Load model with the chat's num_ctx (an empty generate request only loads it)."""
+        try:
+            self.acquire(model)
+        except QueueFull:
+            return  # Busy enough to stay loaded without a ping
+        started = time.perf_counter()
+        try:
+            with telemetry.span("ollama.preload", model=model) as span:
+                response = self.client.generate(model=model, prompt="", keep_alive=self.keep_alive,
+                                                options=self.options(model))
+                load_seconds = (response.get("load_duration") or 0) / 1e9
+                span.set(load_s=round(load_seconds, 3))
+        except Exception as e:
+            self._record_load(model, "preload", time.perf_counter() - started, error=str(e))
+            return
+        finally:
+            self.release(model, requested=False)
+        with self._lock:
+            self._last_used[model] = time.monotonic()
+        if load_seconds > COLD_LOAD_SECONDS:
+            self._record_load(model, "preload", load_seconds)
+
+    def warm_models(self):
+        """The models kept loaded: the max_loaded most recently requested, in configured order before any request."""
+        with self._lock:
+            ranked = sorted(self.models, key=lambda model: -self._last_requested.get(model, 0))
+        return ranked[:self.max_loaded]
+
+    def _keep_warm(self):
+        # One model at a time: loading them all at once only makes the server thrash
+        for model in self.warm_models():
+            if self._stopped.is_set():
+                return
+            self.preload(model)
+        while not self._stopped.wait(self.refresh_seconds / 4):
+            for model in self.warm_models():
+                with self._lock:
+                    idle = time.monotonic() - self._last_used.get(model, 0)
+                if idle > self.refresh_seconds:
+                    self.preload(model)
+
+    def _record_load(self, model, reason, seconds, error=None):
+        event = {"model": model, "reason": reason, "seconds": round(seconds, 3), "at": time.time()}
+        if error:
+            event["error"] = error
+        with self._lock:
+            self.load_events.append(event)
+
+    def _queue(self, model):
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(self.max_concurrency)
+        return queue
+
+    def acquire(self, model, session=None):
+        """Wait for a slot on model; returns the seconds waited. Raises QueueFull when the queue is full."""
+        session = session or BACKGROUND
+        waiter = _Waiter()
+        with self._lock:
+            queue = self._queue(model)
+            if queue.active < queue.limit and not queue.waiting:
+                queue.active += 1
+                queue.served += 1
+                queue.waits.append(0.0)
+                return 0.0
+            if queue.waiting >= self.max_waiting:
+                raise QueueFull(f"{queue.waiting} requests are already waiting for {model}, try again shortly")
+            queue.sessions.setdefault(session, deque()).append(waiter)
+            queue.waiting += 1
+        waiter.granted.wait()
+        return time.perf_counter() - waiter.enqueued
+
+    def release(self, model, requested=True):
+        with self._lock:
+            queue = self._queues[model]
+            if requested:
+                self._last_used[model] = self._last_requested[model] = time.monotonic()
+            if not queue.sessions:
+                queue.active -= 1
+                return
+            # The slot passes to the session at the front, which then goes to the back
+            session, waiters = next(iter(queue.sessions.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                queue.sessions.move_to_end(session)
+            else:
+                del queue.sessions[session]
+            queue.waiting -= 1
+            queue.served += 1
+            queue.waits.append(time.perf_counter() - waiter.enqueued)
+            waiter.granted.set()
+
+    def stream_chat(self, model, messages, stats, session=None, **kwargs):
+        """streaming.stream_chat through the model's queue; stats also gets queue_s."""
+        queued_ns = time.time_ns()
+        stats["queue_s"] = round(self.acquire(model, session), 3)
+        telemetry.record_span("ollama.queue", queued_ns, model=model, session=session, queue_s=stats["queue_s"])
+        try:
+            yield from stream_chat(model, messages, stats, client=self.client, **kwargs)
+        finally:
+            self.release(model)
+            if stats.get("load_s", 0) > COLD_LOAD_SECONDS:
+                self._record_load(model, "request", stats["load_s"])
+
+    def chat(self, model, messages, session=None, **kwargs):
+        """Non-streaming ollama.chat through the model's queue, so the scheduler can stand in for a client."""
+        self.acquire(model, session)
+        try:
+            response = self.client.chat(model=model, messages=messages, **kwargs)
+        finally:
+            self.release(model)
+        if (response.get("load_duration") or 0) / 1e9 > COLD_LOAD_SECONDS:
+            self._record_load(model, "request", response["load_duration"] / 1e9)
+        return response
+
+    @property
+    def stats(self):
+        """Per model: running and waiting requests, requests served and p50/p95 wait, plus cold loads."""
+        with self._lock:
+            models = {}
+            for model, queue in self._queues.items():
+                waits = sorted(queue.waits)
+                models[model] = {
+                    "active": queue.active,
+                    "waiting": queue.waiting,
+                    "waiting_sessions": len(queue.sessions),
+                    "served": queue.served,
+                    "p50_wait_s": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                    "p95_wait_s": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+                }
+            return {"models": models, "load_events": list(self.load_events)}
+
+
+def describe_scheduler(scheduler, model):
+    stats = scheduler.stats
+    queue = stats["models"].get(model)
+    text = f"{model}: idle" if queue is None else (
+        f"{model}: {queue['active']} running, {queue['waiting']} waiting, p95 wait {queue['p95_wait_s']}s"
+    )
+    loads = [event for event in stats["load_events"] if event["model"] == model and "error" not in event]
+    if loads:
+        text += f" · last load {loads[-1]['seconds']}s ({loads[-1]['reason']})"
+    return text
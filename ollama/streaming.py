@@ -0,0 +1,61 @@
+import time
+
+import ollama
+
+import telemetry
+
+
+def stream_chat(model_name, messages, stats, client=None, **kwargs):
+    """
+    Yield the model's reply piece by piece as Ollama generates it.
+
+    stats is filled in as the stream runs: ttft_s (time to first token), total_s,
+    completion_tokens, tokens_per_s and cancelled. If the caller stops iterating (for
+    example the Streamlit page was left mid-answer), the HTTP stream is closed so the
+    server stops generating.
+    """
+    client = client or ollama
+    started, started_ns = time.perf_counter(), time.time_ns()
+    first_token_at = None
+    pieces = 0
+    stats.update(model=model_name, cancelled=True)
+    chunks = client.chat(model=model_name, messages=messages, stream=True, **kwargs)
+    try:
+        for chunk in chunks:
+            content = chunk["message"]["content"]
+            if content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    stats["ttft_s"] = round(first_token_at - started, 3)
+                pieces += 1
+                yield content
+            if chunk.get("done"):
+                # The final chunk carries the server's own token counts and timings (ns)
+                stats["prompt_tokens"] = chunk.get("prompt_eval_count")
+                stats["completion_tokens"] = chunk.get("eval_count")
+                stats["load_s"] = round((chunk.get("load_duration") or 0) / 1e9, 3)
+                if chunk.get("eval_duration"):
+                    stats["tokens_per_s"] = round(chunk["eval_count"] / (chunk["eval_duration"] / 1e9), 1)
+        stats["cancelled"] = False
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+        finished_at = time.perf_counter()
+        stats["total_s"] = round(finished_at - started, 3)
+        if "tokens_per_s" not in stats and pieces > 1:
+            # No server timings (e.g. cancelled): count streamed pieces, about one token each
+            stats.setdefault("completion_tokens", pieces)
+            stats["tokens_per_s"] = round((pieces - 1) / (finished_at - first_token_at), 1)
+        telemetry.record_span(
+            "ollama.chat", started_ns, model=model_name, messages=len(messages), cancelled=stats["cancelled"],
+            prompt_tokens=stats.get("prompt_tokens"), completion_tokens=stats.get("completion_tokens"),
+            ttft_s=stats.get("ttft_s"), tokens_per_s=stats.get("tokens_per_s"), load_s=stats.get("load_s"),
+        )
+
+
+def describe_stats(stats):
+    if "ttft_s" not in stats:
+        return ""
+    text = f"Queued {stats['queue_s']}s · " if stats.get("queue_s", 0) >= 0.05 else ""
+    text += f"First token {stats['ttft_s']}s · {stats.get('tokens_per_s', '?')} tokens/s · {stats['total_s']}s total"
+    return text + " (cancelled)" if stats.get("cancelled") else text
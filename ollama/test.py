@@ -1,32 +1,35 @@
-import ollama
+from conversation_memory import ConversationMemory, describe_memory
+from streaming import describe_stats, stream_chat
 
 def chat_with_ollama(model_name="llama3.2"):
     """
     Simple chat function to interact with an Ollama model.
     """
     print(f"Chatting with {model_name}. Type 'quit' to exit.")
-    conversation_history = []
+    memory = ConversationMemory()
 
     while True:
         user_input = input("\nYou: ")
         if user_input.lower() == 'quit':
             break
 
-        # Add user message to conversation history
-        conversation_history.append({"role": "user", "content": user_input})
+        messages = memory.messages(model_name, user_input)
+        stats = {}
 
         try:
-            # Call Ollama's chat API
-            response = ollama.chat(
-                model=model_name,
-                messages=conversation_history
-            )
-            ai_response = response["message"]["content"]
-            print(f"AI: {ai_response}")
+            # Call Ollama's chat API and print the response as it streams in
+            print("AI: ", end="", flush=True)
+            pieces = []
+            for piece in stream_chat(model_name, messages, stats, **memory.chat_options(model_name)):
+                print(piece, end="", flush=True)
+                pieces.append(piece)
 
-            # Add AI response to conversation history
-            conversation_history.append({"role": "assistant", "content": ai_response})
+            # Add user message and AI response to the conversation memory
+            memory.add_turn(model_name, user_input, "".join(pieces), stats)
+            print(f"\n[{describe_stats(stats)}; {describe_memory(memory)}]")
 
+        except KeyboardInterrupt:
+            print("\n[cancelled]")
         except Exception as e:
             print(f"Error: {e}")
 